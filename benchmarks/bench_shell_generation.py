@@ -0,0 +1,154 @@
+"""Throughput and memory benchmark for shell texture generation.
+
+Runs generate_shell_layers, the bpy-free pixel pipeline behind every add-on
+build (noise setup, shared layer maps, per-layer threshold), plus the 8-bit
+conversion over a matrix of texture sizes, layer counts, patterns and
+opaque vs. alpha bases. Layers are consumed the way create_shell_textures
+consumes them, so the peak memory includes whatever the pipeline holds.
+No Blender or GPU is needed:
+
+    python benchmarks/bench_shell_generation.py            # full matrix
+    python benchmarks/bench_shell_generation.py --quick    # small cases only
+    python benchmarks/bench_shell_generation.py --update   # record a new baseline
+
+Each case records wall time, pixels per second and peak traced memory. The
+first run (or --update) writes the baseline JSON; later runs compare against
+it and exit with status 1 if a case got slower or needs more memory than
+the threshold allows. Baselines are machine specific, so keep one per
+machine rather than sharing it.
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shelltexture_vrm.core import (  # noqa: E402
+    PATTERNS,
+    derive_seed,
+    generate_shell_layers,
+    hair_noise_alpha,
+    layer_deletion_ratios,
+    noise_map,
+    to_uint8,
+)
+
+SIZES = (256, 1024, 4096)
+LAYER_COUNTS = (1, 8, 64)
+QUICK_SIZES = (256, 1024)
+QUICK_LAYER_COUNTS = (1, 8)
+
+# Timing noise on tiny cases is not a regression
+MIN_TIME_DELTA = 0.01
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def base_texture(size, alpha):
+    """Seeded test texture; with alpha, about a third of it is transparent"""
+    rng = np.random.Generator(np.random.PCG64(size))
+    rgba = rng.random((size, size, 4), dtype=np.float32)
+    if alpha:
+        rgba[..., 3] = np.where(rgba[..., 3] < 0.33, 0.0, rgba[..., 3])
+    else:
+        rgba[..., 3] = 1.0
+    return rgba
+
+
+def generate(rgba, layers, pattern, seed=0):
+    """One material's worth of shell layers, as a build generates them"""
+    size = rgba.shape[0]
+    noise_alpha = hair_noise_alpha(seed, 512)
+    noise_vals = noise_map(derive_seed(seed, "benchmark"), size, size, pattern)
+    for pixels in generate_shell_layers(rgba, layer_deletion_ratios(layers), noise_alpha, noise_vals, pattern):
+        # Each layer becomes an image before the next one, like in create_shell_textures
+        to_uint8(pixels)
+
+
+def run_case(size, layers, pattern, alpha, repeat):
+    rgba = base_texture(size, alpha)
+
+    tracemalloc.start()
+    generate(rgba, layers, pattern)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # Memory is measured on a separate run, tracing slows allocations down
+    wall = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        generate(rgba, layers, pattern)
+        wall = min(wall, time.perf_counter() - start)
+
+    return {
+        "wall_s": round(wall, 4),
+        "pixels_per_s": round(size * size * layers / wall),
+        "peak_mb": round(peak / (1024 * 1024), 1),
+    }
+
+
+def case_name(size, layers, pattern, alpha):
+    return f"{size}px/{layers}L/{pattern}/{'alpha' if alpha else 'opaque'}"
+
+
+def compare(results, baseline, threshold):
+    """Names and descriptions of cases that regressed beyond threshold"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result["wall_s"] > base["wall_s"] * (1 + threshold) + MIN_TIME_DELTA:
+            regressions.append(f"{name}: {result['wall_s']:.3f}s vs {base['wall_s']:.3f}s")
+        if result["peak_mb"] > base["peak_mb"] * (1 + threshold):
+            regressions.append(f"{name}: {result['peak_mb']:.1f} MB vs {base['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark shell texture generation.")
+    parser.add_argument("--quick", action="store_true", help="Only sizes up to 1024 and up to 8 layers")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case, the best counts (default: 3)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--update", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown or memory growth before a case counts as regressed (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    layer_counts = QUICK_LAYER_COUNTS if args.quick else LAYER_COUNTS
+
+    results = {}
+    for size, layers, pattern, alpha in itertools.product(sizes, layer_counts, PATTERNS, (False, True)):
+        name = case_name(size, layers, pattern, alpha)
+        results[name] = run_case(size, layers, pattern, alpha, args.repeat)
+        result = results[name]
+        print(f"{name:<32} {result['wall_s']:>9.3f}s {result['pixels_per_s'] / 1e6:>9.1f} Mpx/s {result['peak_mb']:>8.1f} MB")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.update or not baseline:
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
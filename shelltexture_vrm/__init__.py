@@ -0,0 +1,20 @@
+bl_info = {
+    "name": "VRM Hair/Fur Shell Texturing",
+    "author": "Meringue Rouge",
+    "version": (1, 0),
+    "blender": (4, 2, 0),
+    "location": "View 3D > UI > VRM",
+    "description": "Shell texturing for VRM hair and fur with MToon materials and per-material control",
+    "category": "Object",
+    "website": "https://github.com/Meringue-Rouge/VRM-Fur-Shell-Texturing"
+}
+
+# The add-on itself needs Blender, but the bpy-free core module must stay
+# importable from plain Python (e.g. in process pool workers).
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+if bpy is not None:
+    from .addon import register, unregister
@@ -0,0 +1,2380 @@
+import bpy
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+import numpy as np
+
+from .core import (
+    ATLAS_GUTTER,
+    CACHE_VERSION,
+    CUTOFF_MIN,
+    PATTERNS,
+    PATTERN_PARAMS,
+    ShellTextureCache,
+    StageTimer,
+    atlas_cell_size,
+    atlas_grid,
+    atlas_shrink,
+    base_image_digest,
+    cutoff_shell_pixels,
+    derive_seed,
+    downsample_alpha,
+    downsample_rgba,
+    generate_shell_layers,
+    hair_noise_alpha,
+    init_shell_worker,
+    layer_deletion_ratios,
+    layer_shrink,
+    lod_layer_indices,
+    noise_map,
+    noise_rows,
+    place_atlas_tile,
+    pattern_enum_items,
+    pattern_key_params,
+    pixel_digest,
+    prepare_shell_maps,
+    shell_fingerprint,
+    shell_layers_worker,
+    shrunk_size,
+    threshold_shell_layer,
+)
+
+# Upper bound on the 8-bit layers one pool task holds and sends back
+POOL_TASK_BYTES = 256 * 1024 * 1024
+
+# ------------------------------------------------------------
+# Material checkbox item
+# ------------------------------------------------------------
+
+class VRMShellMaterialItem(bpy.types.PropertyGroup):
+    material: bpy.props.PointerProperty(type=bpy.types.Material)
+    use_shell: bpy.props.BoolProperty(default=True)
+
+
+# ------------------------------------------------------------
+# Sync material list (manual)
+# ------------------------------------------------------------
+
+def sync_material_list(obj):
+    if not obj or obj.type != 'MESH':
+        return
+
+    obj.vrm_shell_materials.clear()
+    for mat in obj.data.materials:
+        if is_shell_material(mat):
+            # Shell slots are appended after the base materials
+            break
+        item = obj.vrm_shell_materials.add()
+        item.material = mat
+        item.use_shell = True
+
+
+# ------------------------------------------------------------
+# Helper: Generated shell data
+# ------------------------------------------------------------
+
+def is_shell_material(material):
+    return material is not None and "shell_base" in material
+
+
+def tag_shell_data(datablock, owner, layer, fingerprint):
+    """Record what datablock was generated from, its layer and its parameters.
+
+    owner is the base material name for shell materials and the source key
+    (base pixels plus noise parameters) for shell textures, which may be
+    shared by several materials and objects.
+    """
+    datablock["shell_base"] = owner
+    datablock["shell_layer"] = layer
+    datablock["shell_fingerprint"] = fingerprint
+
+
+def is_current(datablock, fingerprint):
+    return datablock is not None and datablock.get("shell_fingerprint") == fingerprint
+
+
+def remove_shell_slots(obj):
+    """Remove the shell material slots a previous run appended to obj"""
+    materials = obj.data.materials
+    for i in reversed(range(len(materials))):
+        if is_shell_material(materials[i]):
+            materials.pop(index=i)
+
+
+def remove_unused_shell_materials(base_name, keep_materials):
+    """Drop shell materials of base_name that are no longer used"""
+    for mat in list(bpy.data.materials):
+        if mat.get("shell_base") == base_name and mat.name not in keep_materials and mat.users == 0:
+            bpy.data.materials.remove(mat)
+
+
+def remove_unused_shell_images(keep_images):
+    """Drop generated shell textures no material uses anymore"""
+    for img in list(bpy.data.images):
+        if "shell_base" in img and img.name not in keep_images and img.users == 0:
+            bpy.data.images.remove(img)
+
+
+def shell_slot_layout(obj):
+    """Map each base material slot of obj to its shell materials, ordered by layer"""
+    materials = obj.data.materials
+    base_slots = {}
+    for i, mat in enumerate(materials):
+        if mat and not is_shell_material(mat):
+            base_slots.setdefault(mat.name, i)
+
+    layout = {}
+    for mat in materials:
+        if is_shell_material(mat) and mat["shell_base"] in base_slots:
+            layout.setdefault(base_slots[mat["shell_base"]], []).append(mat)
+    for shells in layout.values():
+        shells.sort(key=lambda mat: mat["shell_layer"])
+    return layout
+
+
+# ------------------------------------------------------------
+# Operator: Sync Materials
+# ------------------------------------------------------------
+
+class SyncMaterialsOperator(bpy.types.Operator):
+    bl_idname = "object.sync_shell_materials"
+    bl_label = "Refresh Material List"
+    bl_options = {'REGISTER', 'UNDO'}
+    bl_description = "Update the material list from the active object"
+
+    def execute(self, context):
+        obj = context.active_object
+        if not obj or obj.type != 'MESH':
+            self.report({'ERROR'}, "Select a mesh object.")
+            return {'CANCELLED'}
+        
+        sync_material_list(obj)
+        self.report({'INFO'}, f"Material list updated: {len(obj.vrm_shell_materials)} materials found")
+        return {'FINISHED'}
+
+
+# ------------------------------------------------------------
+# Helper: Enable MToon for material
+# ------------------------------------------------------------
+
+def enable_mtoon_material(material, alpha_mode='BLEND', alpha_cutoff=None):
+    """Enable VRM MToon material properties without outline"""
+    try:
+        material.vrm_addon_extension.mtoon1.enabled = True
+        material.vrm_addon_extension.mtoon1.alpha_mode = alpha_mode
+        if alpha_cutoff is not None:
+            material.vrm_addon_extension.mtoon1.alpha_cutoff = alpha_cutoff
+        material.vrm_addon_extension.mtoon1.transparent_with_z_write = False
+        material.vrm_addon_extension.mtoon1.extensions.vrmc_materials_mtoon.outline_width_mode = 'none'
+        material.vrm_addon_extension.mtoon1.extensions.vrmc_materials_mtoon.outline_width_factor = 0.0
+        return True
+    except:
+        return False
+
+
+def get_base_image(material):
+    """The MToon base color texture image of material, or None"""
+    try:
+        return material.vrm_addon_extension.mtoon1.pbr_metallic_roughness.base_color_texture.index.source
+    except:
+        return None
+
+
+def get_solid_color_image(color=(1.0, 1.0, 1.0, 1.0)):
+    """512x512 image filled with color, shared by all materials of that color.
+
+    Shell builds use the white default for every untextured material: the
+    shells then only carry the mask and the color stays in each shell
+    material's base_color_factor.
+    """
+    rgba = tuple(min(255, max(0, round(c * 255))) for c in color)
+    temp_name = "Temp_Base_{:02x}{:02x}{:02x}{:02x}".format(*rgba)
+    if temp_name in bpy.data.images:
+        return bpy.data.images[temp_name]
+
+    base_image = bpy.data.images.new(temp_name, 512, 512, alpha=True)
+    pixels = np.empty((512 * 512, 4), dtype=np.float32)
+    pixels[:] = color
+    base_image.pixels.foreach_set(pixels.ravel())
+    base_image.pack()
+    return base_image
+
+
+# ------------------------------------------------------------
+# Helper: Pixel buffers as NumPy arrays
+# ------------------------------------------------------------
+
+def image_to_array(image):
+    """Read image pixels into a float32 (height, width, 4) RGBA array"""
+    width, height = image.size
+    buf = np.empty(len(image.pixels), dtype=np.float32)
+    image.pixels.foreach_get(buf)
+    return _pixels_to_rgba(buf, width, height)
+
+
+def _pixels_to_rgba(buf, width, height):
+    channels = buf.size // (width * height)
+    pixels = buf.reshape(height, width, channels)
+    if channels == 4:
+        return pixels
+
+    # Pad RGB / grayscale images to RGBA with opaque alpha
+    rgba = np.ones((height, width, 4), dtype=np.float32)
+    if channels >= 3:
+        rgba[..., :3] = pixels[..., :3]
+    else:
+        rgba[..., :3] = pixels[..., :1]
+    return rgba
+
+
+def image_digest(image):
+    """Hash of an image's pixels, see base_image_digest"""
+    width, height = image.size
+    channels = len(image.pixels) // (width * height)
+    # Slicing image.pixels copies the whole property array on every access,
+    # so read it once; foreach_get fills the float32 buffer without a copy
+    buf = np.empty(len(image.pixels), dtype=np.float32)
+    image.pixels.foreach_get(buf)
+    return base_image_digest(width, height, channels, [buf])
+
+
+# ------------------------------------------------------------
+# Helper: Noise image (binary, alpha only)
+# ------------------------------------------------------------
+
+def get_hair_noise_image(seed, resolution):
+    """Return the VRMHairNoise image for seed and resolution, regenerating it if needed"""
+    img_name = "VRMHairNoise"
+    img = bpy.data.images.get(img_name)
+    if img and tuple(img.size) == (resolution, resolution) and img.get("shell_noise_seed") == seed:
+        return img
+    if img:
+        bpy.data.images.remove(img)
+
+    pixels = np.ones((resolution, resolution, 4), dtype=np.float32)  # white color, alpha only
+    pixels[..., 3] = hair_noise_alpha(seed, resolution)
+
+    img = bpy.data.images.new(img_name, resolution, resolution)
+    img.pixels.foreach_set(pixels.ravel())
+    img.pack()
+    img["shell_noise_seed"] = seed
+    return img
+
+
+# ------------------------------------------------------------
+# Helper: Shell texture cache from scene settings
+# ------------------------------------------------------------
+
+def get_shell_cache(scene):
+    """Return the scene's configured ShellTextureCache, or None if disabled"""
+    if not scene.shell_cache_enabled:
+        return None
+
+    directory = bpy.path.abspath(scene.shell_cache_dir) if scene.shell_cache_dir else ""
+    if not directory:
+        directory = os.path.join(tempfile.gettempdir(), "vrm_shell_cache")
+    try:
+        return ShellTextureCache(directory, scene.shell_cache_size * 1024 * 1024)
+    except OSError:
+        return None
+
+
+def scene_pattern_params(scene):
+    """Pattern kernel parameters (see PATTERN_PARAMS) from the scene settings"""
+    return {name: getattr(scene, f"shell_{name}") for name in PATTERN_PARAMS}
+
+
+# ------------------------------------------------------------
+# Helper: Shell texture storage (packed or external 8-bit PNG)
+# ------------------------------------------------------------
+
+def shell_storage_dir(scene):
+    """Directory for external shell textures, or "" to pack them"""
+    if scene.shell_texture_storage == 'EXTERNAL':
+        return scene.shell_texture_dir or "//shell_textures/"
+    return ""
+
+
+def has_shell_pixels(img):
+    """Whether img's pixels survive saving and reloading the .blend"""
+    return bool(img.packed_file) or (img.source == 'FILE' and os.path.isfile(bpy.path.abspath(img.filepath)))
+
+
+def store_shell_image(img, storage_dir=""):
+    """Keep a generated shell texture with the .blend file.
+
+    Without storage_dir the image is packed. Otherwise it is written as an
+    8-bit RGBA PNG into storage_dir (which may be relative to the .blend) and
+    referenced as an external file, which keeps the .blend and its undo
+    steps small. Images already stored that way are left alone.
+    """
+    if not storage_dir:
+        if not img.packed_file:
+            img.pack()
+        return
+
+    filepath = os.path.join(storage_dir, bpy.path.clean_name(img.name) + ".png")
+    path = bpy.path.abspath(filepath)
+    if not img.packed_file and img.source == 'FILE' and os.path.isfile(path) \
+            and os.path.normpath(bpy.path.abspath(img.filepath)) == os.path.normpath(path):
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    img.filepath_raw = path
+    img.file_format = 'PNG'
+    img.save()
+    if img.packed_file:
+        img.unpack(method='USE_ORIGINAL')
+    img.filepath_raw = filepath
+
+
+# ------------------------------------------------------------
+# Helper: Create modified textures with random pixels deleted and noise multiplied
+# ------------------------------------------------------------
+
+def _new_shell_image(shell_name, pixels):
+    if pixels.dtype == np.uint8:
+        pixels = pixels.astype(np.float32) / 255.0
+
+    height, width = pixels.shape[:2]
+    new_img = bpy.data.images.new(
+        name=shell_name,
+        width=width,
+        height=height,
+        alpha=True
+    )
+    new_img.pixels.foreach_set(pixels.ravel())
+    return new_img
+
+
+def create_shell_textures(base_image, shell_names, deletion_ratios, noise_image=None, noise_vals=None, pattern='RANDOM', cache=None, shrink=0, params=None):
+    """Create one shell texture per deletion ratio in a single pass.
+
+    The base image and noise are decoded once; each layer is a threshold of the
+    shared maps. If deletion_ratios is None, shell_names holds a single shared
+    alpha-cutoff texture. With shrink, the textures are generated at the base
+    size halved shrink times (noise_vals must have that size already).
+    Returns the new images in the order of shell_names, not yet stored (see
+    store_shell_image).
+    """
+    if not base_image:
+        return [None] * len(shell_names)
+
+    noise_alpha = None
+    if noise_image:
+        noise_alpha = downsample_alpha(image_to_array(noise_image)[..., 3], shrink)
+
+    layers = generate_shell_layers(
+        downsample_rgba(image_to_array(base_image), shrink),
+        deletion_ratios,
+        noise_alpha=noise_alpha,
+        noise_vals=noise_vals,
+        pattern=pattern,
+        cache=cache,
+        params=params,
+    )
+    # layers is a generator, so each layer becomes an image before the next is computed
+    return [_new_shell_image(name, pixels) for name, pixels in zip(shell_names, layers)]
+
+
+def run_steps(steps):
+    """Run a step generator to completion and return its return value"""
+    try:
+        while True:
+            next(steps)
+    except StopIteration as done:
+        return done.value
+
+
+def iter_shell_textures_parallel(jobs, noise_image=None, pattern='RANDOM', cache=None, workers=1, timer=None, params=None):
+    """Step generator creating the shell textures of several materials using a process pool.
+
+    jobs is a list of (base_image, shell_names, deletion_ratios, noise_seed,
+    shrink) tuples; with one worker they run in-process. Yields the number of
+    textures created since the previous step. Closing the generator cancels
+    layers still queued in the pool.
+    """
+    jobs = [job for job in jobs if job[0] and job[1]]
+    noise_alpha = None
+    if noise_image and jobs:
+        noise_alpha = image_to_array(noise_image)[..., 3]
+
+    if workers <= 1 or not jobs:
+        timer = timer or StageTimer()
+        for base_image, shell_names, deletion_ratios, noise_seed, shrink in jobs:
+            with timer.stage(f"textures:{base_image.name}"):
+                layers = generate_shell_layers(
+                    downsample_rgba(image_to_array(base_image), shrink),
+                    deletion_ratios,
+                    noise_alpha=downsample_alpha(noise_alpha, shrink),
+                    noise_vals=noise_map(noise_seed, *base_image.size, pattern, params, shrink),
+                    pattern=pattern,
+                    cache=cache,
+                    params=params,
+                )
+                # One step per layer, so progress moves and Esc is handled in between
+                for name, pixels in zip(shell_names, layers):
+                    _new_shell_image(name, pixels)
+                    yield 1
+        return
+
+    # Split layers into chunks so there is at least one task per worker, and
+    # so no task returns more than POOL_TASK_BYTES of 8-bit layers at once.
+    # Bases go to each worker once; workers keep a job's maps across its tasks
+    chunks_per_job = max(1, -(-workers // len(jobs)))
+    tasks = []
+    base_arrays = {}
+    for base_image, shell_names, deletion_ratios, noise_seed, shrink in jobs:
+        if base_image.name not in base_arrays:
+            base_arrays[base_image.name] = image_to_array(base_image)
+        if deletion_ratios is None:
+            tasks.append((shell_names, base_image.name, None, noise_seed, shrink))
+            continue
+        width, height = shrunk_size(*base_image.size, shrink)
+        step = max(1, min(-(-len(shell_names) // chunks_per_job), POOL_TASK_BYTES // (width * height * 4)))
+        for start in range(0, len(shell_names), step):
+            tasks.append((shell_names[start:start + step], base_image.name, deletion_ratios[start:start + step], noise_seed, shrink))
+
+    try:
+        context = multiprocessing.get_context("spawn")
+        pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(workers, len(tasks)), mp_context=context,
+            initializer=init_shell_worker, initargs=(base_arrays, noise_alpha),
+        )
+        try:
+            futures = {
+                pool.submit(shell_layers_worker, base_key, ratios, noise_seed, shrink, pattern, cache, params): names
+                for names, base_key, ratios, noise_seed, shrink in tasks
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = concurrent.futures.wait(
+                    pending, timeout=0.05, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                created = 0
+                for future in done:
+                    for name, pixels in zip(futures[future], future.result()):
+                        _new_shell_image(name, pixels)
+                        created += 1
+                yield created
+        finally:
+            # Don't wait for queued layers if the build was cancelled
+            pool.shutdown(wait=False, cancel_futures=True)
+    except (OSError, concurrent.futures.process.BrokenProcessPool):
+        # Fall back to in-process generation for whatever is still missing
+        init_shell_worker(base_arrays, noise_alpha)
+        try:
+            for names, base_key, ratios, noise_seed, shrink in tasks:
+                remaining = [i for i, name in enumerate(names) if name not in bpy.data.images]
+                if not remaining:
+                    continue
+                layers = shell_layers_worker(
+                    base_key, None if ratios is None else [ratios[i] for i in remaining],
+                    noise_seed, shrink, pattern, cache, params,
+                )
+                for i, pixels in zip(remaining, layers):
+                    _new_shell_image(names[i], pixels)
+                yield len(remaining)
+        finally:
+            init_shell_worker({})
+
+
+def iter_shell_textures_tiled(base_image, shell_names, deletion_ratios, noise_image=None, noise_seed=0, pattern='RANDOM', tile_rows=256, shrink=0, params=None):
+    """Low-memory step generator: layers are computed in tiles of tile_rows rows, without the cache.
+
+    Yields each tile's share of a texture and returns the new images.
+    """
+    if not base_image:
+        return [None] * len(shell_names)
+
+    noise_alpha = None
+    if noise_image:
+        noise_alpha = downsample_alpha(image_to_array(noise_image)[..., 3], shrink)
+
+    # Tiles are cut at the target size; each covers factor times the base rows
+    factor = 1 << shrink
+    base_width, base_height = base_image.size
+    width, height = shrunk_size(base_width, base_height, shrink)
+    tile_rows = max(1, tile_rows // factor)
+    if deletion_ratios is None:
+        deletion_ratios = [None]
+
+    # Raw channels, padded to RGBA per tile by _pixels_to_rgba
+    base = np.empty(len(base_image.pixels), dtype=np.float32)
+    base_image.pixels.foreach_get(base)
+    base = base.reshape(base_height, base_width, -1)
+
+    images = []
+    for name, ratio in zip(shell_names, deletion_ratios):
+        out = np.empty((height, width, 4), dtype=np.float32)
+        for row_start in range(0, height, tile_rows):
+            row_end = min(height, row_start + tile_rows)
+            base_rows = base[row_start * factor:min(base_height, row_end * factor)]
+            maps = prepare_shell_maps(
+                downsample_rgba(_pixels_to_rgba(base_rows, base_width, len(base_rows)), shrink),
+                noise_alpha=noise_alpha,
+                noise_vals=noise_rows(noise_seed, base_width, row_start, row_end, pattern, params, shrink),
+                pattern=pattern,
+                row_start=row_start,
+                params=params,
+                image_height=height,
+            )
+            out[row_start:row_end] = cutoff_shell_pixels(maps) if ratio is None else threshold_shell_layer(maps, ratio)
+            yield (row_end - row_start) / height
+
+        images.append(_new_shell_image(name, out))
+        del out
+
+    return images
+
+
+def iter_shell_atlas(base_image, atlas_name, deletion_ratios, noise_image=None, noise_vals=None, pattern='RANDOM', cache=None, shrink=0, params=None):
+    """Step generator creating one texture with the layer of every deletion ratio as a tile.
+
+    Yields after each tile and returns the new image. Tiles are laid out by
+    atlas_grid and generated at the base size halved shrink times (see
+    atlas_shrink), which noise_vals must match.
+    """
+    noise_alpha = None
+    if noise_image:
+        noise_alpha = downsample_alpha(image_to_array(noise_image)[..., 3], shrink)
+
+    layers = generate_shell_layers(
+        downsample_rgba(image_to_array(base_image), shrink),
+        deletion_ratios,
+        noise_alpha=noise_alpha,
+        noise_vals=noise_vals,
+        pattern=pattern,
+        cache=cache,
+        params=params,
+    )
+    cols, rows = atlas_grid(len(deletion_ratios))
+    atlas = None
+    for k, tile in enumerate(layers):
+        atlas = place_atlas_tile(atlas, k, tile, cols, rows)
+        yield 1
+    return _new_shell_image(atlas_name, atlas)
+
+
+def create_shell_texture(base_image, shell_name, deletion_ratio=0.75, noise_image=None, noise_vals=None, pattern='RANDOM', cache=None, params=None):
+    """Create a new texture based on the original with random pixels deleted and optional noise alpha multiplication"""
+    return create_shell_textures(
+        base_image, [shell_name], [deletion_ratio],
+        noise_image=noise_image, noise_vals=noise_vals, pattern=pattern, cache=cache, params=params,
+    )[0]
+
+
+# ------------------------------------------------------------
+# Helper: Geometry Nodes shell system
+# ------------------------------------------------------------
+
+def _taper_factor(nodes, links, scene):
+    """Add nodes computing the UV based taper factor, return its output socket"""
+    named_attr = nodes.new("GeometryNodeInputNamedAttribute")
+    named_attr.data_type = 'FLOAT_VECTOR'
+    named_attr.inputs[0].default_value = "UVMap"
+
+    separate_xyz = nodes.new("ShaderNodeSeparateXYZ")
+    links.new(named_attr.outputs["Attribute"], separate_xyz.inputs[0])
+
+    uv_value_output = "Y" if scene.shell_taper_axis == 'Y' else "X"
+    uv_value = separate_xyz.outputs[uv_value_output]
+
+    if scene.shell_taper_invert:
+        taper = nodes.new("ShaderNodeClamp")
+        links.new(uv_value, taper.inputs[0])
+    else:
+        subtract = nodes.new("ShaderNodeMath")
+        subtract.operation = 'SUBTRACT'
+        subtract.inputs[0].default_value = 1.0
+        links.new(uv_value, subtract.inputs[1])
+
+        taper = nodes.new("ShaderNodeClamp")
+        links.new(subtract.outputs[0], taper.inputs[0])
+
+    taper.inputs[1].default_value = 0.0
+    taper.inputs[2].default_value = 1.0
+    return taper.outputs[0]
+
+
+def _density_field(nodes, links, scene):
+    """Add nodes reading the per-face fur density, or return None if disabled"""
+    source = scene.shell_density_source
+    if source == 'TEXTURE':
+        if not scene.shell_density_image:
+            return None
+        uv = nodes.new("GeometryNodeInputNamedAttribute")
+        uv.data_type = 'FLOAT_VECTOR'
+        uv.inputs[0].default_value = "UVMap"
+
+        tex = nodes.new("GeometryNodeImageTexture")
+        tex.inputs["Image"].default_value = scene.shell_density_image
+        links.new(uv.outputs["Attribute"], tex.inputs["Vector"])
+        value = tex.outputs["Color"]
+    elif source in {'VERTEX_GROUP', 'COLOR_ATTRIBUTE'}:
+        if not scene.shell_density_attribute:
+            return None
+        attr = nodes.new("GeometryNodeInputNamedAttribute")
+        attr.data_type = 'FLOAT'
+        attr.inputs[0].default_value = scene.shell_density_attribute
+        value = attr.outputs["Attribute"]
+    else:
+        return None
+
+    # Average over each face
+    on_face = nodes.new("GeometryNodeFieldOnDomain")
+    on_face.data_type = 'FLOAT'
+    on_face.domain = 'FACE'
+    links.new(value, on_face.inputs[0])
+    return on_face.outputs[0]
+
+
+def _density_selection(nodes, links, gin, selection, scene):
+    """AND selection with "stored density >= Density Threshold" if density is enabled"""
+    if "Density Threshold" not in gin.outputs:
+        return selection
+
+    density = nodes.new("GeometryNodeInputNamedAttribute")
+    density.data_type = 'FLOAT'
+    density.inputs[0].default_value = "shell_density"
+
+    compare = nodes.new("FunctionNodeCompare")
+    compare.data_type = 'FLOAT'
+    compare.operation = 'GREATER_EQUAL'
+    links.new(density.outputs["Attribute"], compare.inputs[0])
+    links.new(gin.outputs["Density Threshold"], compare.inputs[1])
+
+    both = nodes.new("FunctionNodeBooleanMath")
+    both.operation = 'AND'
+    links.new(selection, both.inputs[0])
+    links.new(compare.outputs["Result"], both.inputs[1])
+    return both.outputs[0]
+
+
+def _progressive_density(nodes, links, gin, repeat_in, geometry, scene):
+    """Drop faces from outer layers as the required density rises toward 1"""
+    if "Density Threshold" not in gin.outputs or not scene.shell_density_progressive:
+        return geometry
+
+    # required = threshold + (1 - threshold) * (iteration + 1) / (layers + 1)
+    add_one = nodes.new("ShaderNodeMath")
+    add_one.operation = 'ADD'
+    links.new(repeat_in.outputs["Iteration"], add_one.inputs[0])
+    add_one.inputs[1].default_value = 1.0
+
+    layers_one = nodes.new("ShaderNodeMath")
+    layers_one.operation = 'ADD'
+    links.new(gin.outputs["Layers"], layers_one.inputs[0])
+    layers_one.inputs[1].default_value = 1.0
+
+    frac = nodes.new("ShaderNodeMath")
+    frac.operation = 'DIVIDE'
+    links.new(add_one.outputs[0], frac.inputs[0])
+    links.new(layers_one.outputs[0], frac.inputs[1])
+
+    required = nodes.new("ShaderNodeMix")
+    required.data_type = 'FLOAT'
+    links.new(frac.outputs[0], required.inputs["Factor"])
+    links.new(gin.outputs["Density Threshold"], required.inputs["A"])
+    required.inputs["B"].default_value = 1.0
+
+    density = nodes.new("GeometryNodeInputNamedAttribute")
+    density.data_type = 'FLOAT'
+    density.inputs[0].default_value = "shell_density"
+
+    compare = nodes.new("FunctionNodeCompare")
+    compare.data_type = 'FLOAT'
+    compare.operation = 'LESS_THAN'
+    links.new(density.outputs["Attribute"], compare.inputs[0])
+    links.new(required.outputs["Result"], compare.inputs[1])
+
+    delete = nodes.new("GeometryNodeDeleteGeometry")
+    delete.domain = 'FACE'
+    links.new(geometry, delete.inputs["Geometry"])
+    links.new(compare.outputs["Result"], delete.inputs["Selection"])
+    return delete.outputs["Geometry"]
+
+
+def _atlas_uv(nodes, links, repeat_in, geometry, scene):
+    """Move the UVs of this iteration's shell into its layer's atlas tile.
+
+    Without atlas mode geometry is returned unchanged. UVs are clamped to
+    0..1 first so they cannot reach into neighbouring tiles, then inset by
+    the tile gutter (see atlas_cell_size).
+    """
+    if not scene.shell_atlas:
+        return geometry
+    cols, rows = atlas_grid(scene.shell_layers)
+
+    uv = nodes.new("GeometryNodeInputNamedAttribute")
+    uv.data_type = 'FLOAT_VECTOR'
+    uv.inputs[0].default_value = "UVMap"
+
+    clamp_low = nodes.new("ShaderNodeVectorMath")
+    clamp_low.operation = 'MAXIMUM'
+    links.new(uv.outputs["Attribute"], clamp_low.inputs[0])
+    clamp_low.inputs[1].default_value = (0.0, 0.0, 0.0)
+
+    clamp_high = nodes.new("ShaderNodeVectorMath")
+    clamp_high.operation = 'MINIMUM'
+    links.new(clamp_low.outputs[0], clamp_high.inputs[0])
+    clamp_high.inputs[1].default_value = (1.0, 1.0, 0.0)
+
+    # Tile of layer k: column k % cols, row k // cols
+    col = nodes.new("ShaderNodeMath")
+    col.operation = 'FLOORED_MODULO'
+    links.new(repeat_in.outputs["Iteration"], col.inputs[0])
+    col.inputs[1].default_value = cols
+
+    row = nodes.new("ShaderNodeMath")
+    row.operation = 'DIVIDE'
+    links.new(repeat_in.outputs["Iteration"], row.inputs[0])
+    row.inputs[1].default_value = cols
+
+    row_floor = nodes.new("ShaderNodeMath")
+    row_floor.operation = 'FLOOR'
+    links.new(row.outputs[0], row_floor.inputs[0])
+
+    tile = nodes.new("ShaderNodeCombineXYZ")
+    links.new(col.outputs[0], tile.inputs["X"])
+    links.new(row_floor.outputs[0], tile.inputs["Y"])
+
+    # Position in the cell: the tile sits between gutters of 1/ATLAS_GUTTER
+    # of its size, so uv_cell = (1 + uv * ATLAS_GUTTER) / (ATLAS_GUTTER + 2)
+    inset = nodes.new("ShaderNodeVectorMath")
+    inset.operation = 'MULTIPLY_ADD'
+    links.new(clamp_high.outputs[0], inset.inputs[0])
+    inset.inputs[1].default_value = (ATLAS_GUTTER / (ATLAS_GUTTER + 2),) * 2 + (0.0,)
+    inset.inputs[2].default_value = (1.0 / (ATLAS_GUTTER + 2),) * 2 + (0.0,)
+
+    # uv' = (uv_cell + tile) / (cols, rows)
+    offset = nodes.new("ShaderNodeVectorMath")
+    offset.operation = 'ADD'
+    links.new(inset.outputs[0], offset.inputs[0])
+    links.new(tile.outputs[0], offset.inputs[1])
+
+    scale = nodes.new("ShaderNodeVectorMath")
+    scale.operation = 'MULTIPLY'
+    links.new(offset.outputs[0], scale.inputs[0])
+    scale.inputs[1].default_value = (1.0 / cols, 1.0 / rows, 0.0)
+
+    store_uv = nodes.new("GeometryNodeStoreNamedAttribute")
+    store_uv.data_type = 'FLOAT2'
+    store_uv.domain = 'CORNER'
+    store_uv.inputs["Name"].default_value = "UVMap"
+    links.new(geometry, store_uv.inputs["Geometry"])
+    links.new(scale.outputs[0], store_uv.inputs["Value"])
+    return store_uv.outputs["Geometry"]
+
+
+def _build_per_material_graph(nodes, links, gin, source, join_final, checked_indices, slot_starts, scene):
+    """One selection and shell loop per material"""
+    for idx in checked_indices:
+        mat_index = nodes.new("GeometryNodeInputMaterialIndex")
+        compare = nodes.new("FunctionNodeCompare")
+        compare.data_type = 'INT'
+        compare.operation = 'EQUAL'
+        compare.inputs[3].default_value = idx
+
+        sep = nodes.new("GeometryNodeSeparateGeometry")
+        links.new(source, sep.inputs["Geometry"])
+        links.new(_density_selection(nodes, links, gin, compare.outputs["Result"], scene), sep.inputs["Selection"])
+        links.new(mat_index.outputs[0], compare.inputs[2])
+
+        repeat_in = nodes.new("GeometryNodeRepeatInput")
+        repeat_out = nodes.new("GeometryNodeRepeatOutput")
+        repeat_out.repeat_items.new("GEOMETRY", "Accum")
+        repeat_out.repeat_items.new("GEOMETRY", "Src")
+        repeat_in.pair_with_output(repeat_out)
+
+        links.new(sep.outputs["Selection"], repeat_in.inputs["Src"])
+        links.new(gin.outputs["Layers"], repeat_in.inputs["Iterations"])
+
+        # Offset = (iteration + 1) * thickness to avoid overlap at 0
+        add_one = nodes.new("ShaderNodeMath")
+        add_one.operation = 'ADD'
+        links.new(repeat_in.outputs["Iteration"], add_one.inputs[0])
+        add_one.inputs[1].default_value = 1.0
+
+        math = nodes.new("ShaderNodeMath")
+        math.operation = 'MULTIPLY'
+        links.new(add_one.outputs[0], math.inputs[0])
+        links.new(gin.outputs["Thickness"], math.inputs[1])
+
+        # Taper based on UV channel
+        taper_out = _taper_factor(nodes, links, scene)
+
+        # Multiply thickness by taper
+        math_mult = nodes.new("ShaderNodeMath")
+        math_mult.operation = 'MULTIPLY'
+        links.new(math.outputs[0], math_mult.inputs[0])
+        links.new(taper_out, math_mult.inputs[1])
+
+        vec = nodes.new("ShaderNodeVectorMath")
+        vec.operation = 'SCALE'
+        links.new(nodes.new("GeometryNodeInputNormal").outputs[0], vec.inputs[0])
+        links.new(math_mult.outputs[0], vec.inputs[3])
+
+        setpos = nodes.new("GeometryNodeSetPosition")
+        links.new(_progressive_density(nodes, links, gin, repeat_in, repeat_in.outputs["Src"], scene), setpos.inputs["Geometry"])
+        links.new(vec.outputs[0], setpos.inputs["Offset"])
+
+        # Set material index = start + iteration (atlas: one slot for all layers)
+        int_start = nodes.new("FunctionNodeInputInt")
+        int_start.name = f"shell_slot_start_{idx}"
+        int_start.integer = slot_starts[idx]
+
+        add_index = nodes.new("ShaderNodeMath")
+        add_index.operation = 'MULTIPLY_ADD'
+        links.new(repeat_in.outputs["Iteration"], add_index.inputs[0])
+        add_index.inputs[1].default_value = 0.0 if scene.shell_atlas else 1.0
+        links.new(int_start.outputs[0], add_index.inputs[2])
+
+        set_index = nodes.new("GeometryNodeSetMaterialIndex")
+        links.new(_atlas_uv(nodes, links, repeat_in, setpos.outputs["Geometry"], scene), set_index.inputs["Geometry"])
+        links.new(add_index.outputs[0], set_index.inputs["Material Index"])
+
+        join = nodes.new("GeometryNodeJoinGeometry")
+        links.new(repeat_in.outputs["Accum"], join.inputs["Geometry"])
+        links.new(set_index.outputs["Geometry"], join.inputs["Geometry"])
+
+        links.new(join.outputs["Geometry"], repeat_out.inputs["Accum"])
+        links.new(repeat_in.outputs["Src"], repeat_out.inputs["Src"])
+
+        links.new(repeat_out.outputs["Accum"], join_final.inputs["Geometry"])
+
+
+def _build_flat_graph(nodes, links, gin, source, join_final, checked_indices, slot_starts, scene):
+    """A single selection and shell loop for all materials.
+
+    Taper and normals are stored as attributes once before the loop, and each
+    face's first shell slot (plus one, 0 = no shell) is looked up from its
+    material index, so the node count does not grow with the material count.
+    """
+    # Taper factor and normal, computed once on the base geometry
+    store_taper = nodes.new("GeometryNodeStoreNamedAttribute")
+    store_taper.data_type = 'FLOAT'
+    store_taper.domain = 'POINT'
+    store_taper.inputs["Name"].default_value = "shell_taper"
+    links.new(source, store_taper.inputs["Geometry"])
+    links.new(_taper_factor(nodes, links, scene), store_taper.inputs["Value"])
+
+    store_normal = nodes.new("GeometryNodeStoreNamedAttribute")
+    store_normal.data_type = 'FLOAT_VECTOR'
+    store_normal.domain = 'POINT'
+    store_normal.inputs["Name"].default_value = "shell_normal"
+    links.new(store_taper.outputs["Geometry"], store_normal.inputs["Geometry"])
+    links.new(nodes.new("GeometryNodeInputNormal").outputs[0], store_normal.inputs["Value"])
+
+    # Material index -> first shell slot + 1
+    slot_lookup = nodes.new("GeometryNodeIndexSwitch")
+    slot_lookup.name = "shell_slot_lookup"
+    slot_lookup.data_type = 'INT'
+    item_count = max(checked_indices) + 1
+    while len(slot_lookup.index_switch_items) < item_count:
+        slot_lookup.index_switch_items.new()
+    for i in range(len(slot_lookup.index_switch_items)):
+        slot_lookup.inputs[i + 1].default_value = slot_starts[i] + 1 if i in slot_starts else 0
+    links.new(nodes.new("GeometryNodeInputMaterialIndex").outputs[0], slot_lookup.inputs["Index"])
+
+    store_slot = nodes.new("GeometryNodeStoreNamedAttribute")
+    store_slot.data_type = 'INT'
+    store_slot.domain = 'FACE'
+    store_slot.inputs["Name"].default_value = "shell_slot"
+    links.new(store_normal.outputs["Geometry"], store_slot.inputs["Geometry"])
+    links.new(slot_lookup.outputs[0], store_slot.inputs["Value"])
+
+    slot_attr = nodes.new("GeometryNodeInputNamedAttribute")
+    slot_attr.data_type = 'INT'
+    slot_attr.inputs[0].default_value = "shell_slot"
+
+    compare = nodes.new("FunctionNodeCompare")
+    compare.data_type = 'INT'
+    compare.operation = 'GREATER_THAN'
+    links.new(slot_attr.outputs["Attribute"], compare.inputs[2])
+    compare.inputs[3].default_value = 0
+
+    sep = nodes.new("GeometryNodeSeparateGeometry")
+    sep.domain = 'FACE'
+    links.new(store_slot.outputs["Geometry"], sep.inputs["Geometry"])
+    links.new(_density_selection(nodes, links, gin, compare.outputs["Result"], scene), sep.inputs["Selection"])
+
+    repeat_in = nodes.new("GeometryNodeRepeatInput")
+    repeat_out = nodes.new("GeometryNodeRepeatOutput")
+    repeat_out.repeat_items.new("GEOMETRY", "Accum")
+    repeat_out.repeat_items.new("GEOMETRY", "Src")
+    repeat_in.pair_with_output(repeat_out)
+
+    links.new(sep.outputs["Selection"], repeat_in.inputs["Src"])
+    links.new(gin.outputs["Layers"], repeat_in.inputs["Iterations"])
+
+    # Offset = normal * (iteration + 1) * thickness * taper
+    add_one = nodes.new("ShaderNodeMath")
+    add_one.operation = 'ADD'
+    links.new(repeat_in.outputs["Iteration"], add_one.inputs[0])
+    add_one.inputs[1].default_value = 1.0
+
+    math = nodes.new("ShaderNodeMath")
+    math.operation = 'MULTIPLY'
+    links.new(add_one.outputs[0], math.inputs[0])
+    links.new(gin.outputs["Thickness"], math.inputs[1])
+
+    taper_attr = nodes.new("GeometryNodeInputNamedAttribute")
+    taper_attr.data_type = 'FLOAT'
+    taper_attr.inputs[0].default_value = "shell_taper"
+
+    math_mult = nodes.new("ShaderNodeMath")
+    math_mult.operation = 'MULTIPLY'
+    links.new(math.outputs[0], math_mult.inputs[0])
+    links.new(taper_attr.outputs["Attribute"], math_mult.inputs[1])
+
+    normal_attr = nodes.new("GeometryNodeInputNamedAttribute")
+    normal_attr.data_type = 'FLOAT_VECTOR'
+    normal_attr.inputs[0].default_value = "shell_normal"
+
+    vec = nodes.new("ShaderNodeVectorMath")
+    vec.operation = 'SCALE'
+    links.new(normal_attr.outputs["Attribute"], vec.inputs[0])
+    links.new(math_mult.outputs[0], vec.inputs[3])
+
+    setpos = nodes.new("GeometryNodeSetPosition")
+    links.new(_progressive_density(nodes, links, gin, repeat_in, repeat_in.outputs["Src"], scene), setpos.inputs["Geometry"])
+    links.new(vec.outputs[0], setpos.inputs["Offset"])
+
+    # Material index = shell_slot - 1 + iteration (atlas: one slot for all layers)
+    add_index = nodes.new("ShaderNodeMath")
+    add_index.operation = 'MULTIPLY_ADD'
+    links.new(repeat_in.outputs["Iteration"], add_index.inputs[0])
+    add_index.inputs[1].default_value = 0.0 if scene.shell_atlas else 1.0
+    links.new(slot_attr.outputs["Attribute"], add_index.inputs[2])
+
+    sub_one = nodes.new("ShaderNodeMath")
+    sub_one.operation = 'SUBTRACT'
+    links.new(add_index.outputs[0], sub_one.inputs[0])
+    sub_one.inputs[1].default_value = 1.0
+
+    set_index = nodes.new("GeometryNodeSetMaterialIndex")
+    links.new(_atlas_uv(nodes, links, repeat_in, setpos.outputs["Geometry"], scene), set_index.inputs["Geometry"])
+    links.new(sub_one.outputs[0], set_index.inputs["Material Index"])
+
+    join = nodes.new("GeometryNodeJoinGeometry")
+    links.new(repeat_in.outputs["Accum"], join.inputs["Geometry"])
+    links.new(set_index.outputs["Geometry"], join.inputs["Geometry"])
+
+    links.new(join.outputs["Geometry"], repeat_out.inputs["Accum"])
+    links.new(repeat_in.outputs["Src"], repeat_out.inputs["Src"])
+
+    links.new(repeat_out.outputs["Accum"], join_final.inputs["Geometry"])
+
+
+def build_shell_node_group(gn, checked_indices, slot_starts, scene):
+    """(Re)build the shell node tree gn for materials starting at slot_starts"""
+    gn.nodes.clear()
+    gn.interface.clear()
+
+    nodes = gn.nodes
+    links = gn.links
+
+    iface = gn.interface
+
+    iface.new_socket(
+        name="Geometry",
+        description="",
+        in_out='INPUT',
+        socket_type='NodeSocketGeometry'
+    )
+
+    iface.new_socket(
+        name="Layers",
+        description="",
+        in_out='INPUT',
+        socket_type='NodeSocketInt'
+    ).default_value = scene.shell_layers
+
+    iface.new_socket(
+        name="Thickness",
+        description="",
+        in_out='INPUT',
+        socket_type='NodeSocketFloat'
+    ).default_value = 0.005
+
+    density = _density_field(nodes, links, scene)
+    if density is not None:
+        iface.new_socket(
+            name="Density Threshold",
+            description="Faces with a lower fur density get no shells",
+            in_out='INPUT',
+            socket_type='NodeSocketFloat'
+        ).default_value = scene.shell_density_threshold
+
+    iface.new_socket(
+        name="Geometry",
+        description="",
+        in_out='OUTPUT',
+        socket_type='NodeSocketGeometry'
+    )
+
+    gin = nodes.new("NodeGroupInput")
+    gout = nodes.new("NodeGroupOutput")
+
+    # Shells are built from source, which may carry extra shell_* attributes
+    source = gin.outputs["Geometry"]
+    if density is not None:
+        store_density = nodes.new("GeometryNodeStoreNamedAttribute")
+        store_density.data_type = 'FLOAT'
+        store_density.domain = 'FACE'
+        store_density.inputs["Name"].default_value = "shell_density"
+        links.new(source, store_density.inputs["Geometry"])
+        links.new(density, store_density.inputs["Value"])
+        source = store_density.outputs["Geometry"]
+
+    join_final = nodes.new("GeometryNodeJoinGeometry")
+    links.new(gin.outputs["Geometry"], join_final.inputs["Geometry"])
+
+    if scene.shell_graph_layout == 'FLAT':
+        _build_flat_graph(nodes, links, gin, source, join_final, checked_indices, slot_starts, scene)
+    else:
+        _build_per_material_graph(nodes, links, gin, source, join_final, checked_indices, slot_starts, scene)
+
+    # Drop the helper attributes again from the combined result
+    remove_attrs = nodes.new("GeometryNodeRemoveAttribute")
+    remove_attrs.pattern_mode = 'WILDCARD'
+    remove_attrs.inputs["Name"].default_value = "shell_*"
+    links.new(join_final.outputs["Geometry"], remove_attrs.inputs["Geometry"])
+
+    links.new(remove_attrs.outputs["Geometry"], gout.inputs["Geometry"])
+
+
+def shell_node_group_signature(checked_indices, slot_starts, scene):
+    """Fingerprint of everything build_shell_node_group bakes into a tree"""
+    density_image = scene.shell_density_image.name if scene.shell_density_image else ""
+    return shell_fingerprint(
+        indices=list(checked_indices),
+        slot_starts=[slot_starts[idx] for idx in checked_indices],
+        layers=scene.shell_layers,
+        taper_axis=scene.shell_taper_axis,
+        taper_invert=scene.shell_taper_invert,
+        layout=scene.shell_graph_layout,
+        density_source=scene.shell_density_source,
+        density_attribute=scene.shell_density_attribute,
+        density_image=density_image,
+        density_progressive=scene.shell_density_progressive,
+        atlas=scene.shell_atlas,
+        atlas_gutter=ATLAS_GUTTER if scene.shell_atlas else None,
+    )
+
+
+def get_shell_node_group(checked_indices, slot_starts, scene):
+    """Shell node group for this slot layout, shared by objects built alike"""
+    signature = shell_node_group_signature(checked_indices, slot_starts, scene)
+    for gn in bpy.data.node_groups:
+        if gn.get("shell_signature") == signature:
+            return gn
+
+    gn = bpy.data.node_groups.new("VRM_ShellFurSystem", 'GeometryNodeTree')
+    build_shell_node_group(gn, checked_indices, slot_starts, scene)
+    gn["shell_signature"] = signature
+    return gn
+
+
+def has_shell_slot_nodes(gn, checked_indices):
+    """Whether gn has slot start nodes for these materials (trees from older versions don't)"""
+    slot_lookup = gn.nodes.get("shell_slot_lookup")
+    if slot_lookup:
+        return max(checked_indices) < len(slot_lookup.index_switch_items)
+    return all(gn.nodes.get(f"shell_slot_start_{idx}") for idx in checked_indices)
+
+
+def set_shell_slot_starts(gn, slot_starts):
+    """Point an existing shell node tree at new slot starts, leaving the rest of the graph as built"""
+    slot_lookup = gn.nodes.get("shell_slot_lookup")
+    if slot_lookup:
+        for i in range(len(slot_lookup.index_switch_items)):
+            slot_lookup.inputs[i + 1].default_value = slot_starts[i] + 1 if i in slot_starts else 0
+        return
+
+    for idx, start in slot_starts.items():
+        gn.nodes[f"shell_slot_start_{idx}"].integer = start
+
+
+def get_shell_variant_node_group(source_gn, checked_indices, slot_starts, layers):
+    """Copy of source_gn with other slot starts and layer count, shared by identical variants.
+
+    source_gn must pass has_shell_slot_nodes.
+    """
+    signature = shell_fingerprint(
+        source=source_gn.get("shell_signature") or source_gn.name,
+        slot_starts=[slot_starts[idx] for idx in checked_indices],
+        layers=layers,
+    )
+    for gn in bpy.data.node_groups:
+        if gn.get("shell_signature") == signature:
+            return gn
+
+    gn = source_gn.copy()
+    set_shell_slot_starts(gn, slot_starts)
+    gn.interface.items_tree["Layers"].default_value = layers
+    gn["shell_signature"] = signature
+    return gn
+
+
+def remove_unused_shell_node_groups():
+    """Remove signed shell node groups no modifier uses anymore"""
+    for gn in list(bpy.data.node_groups):
+        if "shell_signature" in gn and gn.users == 0:
+            bpy.data.node_groups.remove(gn)
+
+
+# ------------------------------------------------------------
+# Helper: Purge unused shell data
+# ------------------------------------------------------------
+
+def image_bytes(img):
+    """Approximate memory held by img: its pixel buffer plus a packed file"""
+    size = 0
+    if img.has_data:
+        width, height = img.size
+        size += width * height * img.channels * (4 if img.is_float else 1)
+    if img.packed_file:
+        size += img.packed_file.size
+    return size
+
+
+def is_shell_source_image(img):
+    """Images builds generate only as input: solid color bases and the hair noise"""
+    return img.name.startswith("Temp_Base_") or img.name == "VRMHairNoise"
+
+
+def purge_unused_shell_data(include_sources=False):
+    """Remove generated shell data that nothing uses anymore.
+
+    Covers shell materials, signed node groups and shell textures; with
+    include_sources also the Temp_Base_* and VRMHairNoise images. External
+    PNG files are left on disk. Returns the image memory reclaimed in bytes.
+    """
+    for mat in list(bpy.data.materials):
+        if is_shell_material(mat) and mat.users == 0:
+            bpy.data.materials.remove(mat)
+
+    remove_unused_shell_node_groups()
+
+    reclaimed = 0
+    for img in list(bpy.data.images):
+        generated = "shell_base" in img or (include_sources and is_shell_source_image(img))
+        if generated and img.users == 0:
+            reclaimed += image_bytes(img)
+            bpy.data.images.remove(img)
+    return reclaimed
+
+
+def _group_input_identifier(gn, name):
+    for item in gn.interface.items_tree:
+        if item.item_type == 'SOCKET' and item.in_out == 'INPUT' and item.name == name:
+            return item.identifier
+    return None
+
+
+def get_modifier_input(mod, name, default=None):
+    """Value of a node group input on a Geometry Nodes modifier"""
+    identifier = _group_input_identifier(mod.node_group, name)
+    if identifier is None:
+        return default
+    return mod.get(identifier, default)
+
+
+def set_modifier_input(mod, name, value):
+    identifier = _group_input_identifier(mod.node_group, name)
+    if identifier is not None:
+        mod[identifier] = value
+
+
+def realize_shell_modifier(context, obj):
+    """Bake the Shell Fur modifier of obj into its mesh.
+
+    Other modifiers (e.g. Armature) are disabled while evaluating and stay on
+    the object, so the result is still rigged. Shape keys are not kept.
+    """
+    disabled = [mod for mod in obj.modifiers if mod.name != "Shell Fur" and mod.show_viewport]
+    for mod in disabled:
+        mod.show_viewport = False
+
+    context.view_layer.update()
+    depsgraph = context.evaluated_depsgraph_get()
+    mesh = bpy.data.meshes.new_from_object(
+        obj.evaluated_get(depsgraph),
+        preserve_all_data_layers=True,
+        depsgraph=depsgraph,
+    )
+
+    for mod in disabled:
+        mod.show_viewport = True
+
+    old_mesh = obj.data
+    obj.data = mesh
+    mesh.name = old_mesh.name
+    if old_mesh.users == 0:
+        bpy.data.meshes.remove(old_mesh)
+    obj.modifiers.remove(obj.modifiers["Shell Fur"])
+
+
+# ------------------------------------------------------------
+# Helper: Cost estimate and build statistics
+# ------------------------------------------------------------
+
+# Statistics of the most recent shell build, see ShellTexturingOperator
+last_build_stats = {}
+
+_estimate_cache = {}
+
+
+def enabled_material_indices(obj):
+    """Slot indices of the base materials enabled in obj's shell material list"""
+    return [
+        i for i, item in enumerate(obj.vrm_shell_materials)
+        if item.use_shell and item.material
+        and i < len(obj.data.materials) and obj.data.materials[i] == item.material
+        and not is_shell_material(item.material)
+    ]
+
+
+def estimate_shell_cost(obj, scene):
+    """Estimate what Add Shell Texturing would add to obj with the current settings.
+
+    Triangle counts ignore the density mask, so they are an upper bound.
+    Texture memory assumes 8-bit RGBA and follows the downsampling schedule.
+    """
+    mesh = obj.data
+    enabled = enabled_material_indices(obj)
+    layers = scene.shell_layers
+    atlas = scene.shell_atlas
+    single_texture = scene.shell_alpha_cutoff or atlas
+    textures_per_material = 1 if single_texture else layers
+    halve_every = 0 if single_texture else scene.shell_downsample_every
+    min_size = scene.shell_downsample_min
+    atlas_max_size = scene.shell_atlas_max_size if atlas else 0
+
+    # Materials with the same base texture, and all untextured ones, share their shell textures
+    sources = {}
+    for i in enabled:
+        material = mesh.materials[i]
+        base_image = get_base_image(material)
+        if base_image:
+            sources[base_image.name] = tuple(base_image.size)
+        else:
+            # Untextured materials share one white mask set
+            sources[None] = (512, 512)
+
+    # Face material assignments are read on every call (foreach_get is cheap),
+    # so reassigning faces invalidates the estimate as well
+    material_index = np.empty(len(mesh.polygons), dtype=np.int32)
+    loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+    if enabled:
+        mesh.polygons.foreach_get("material_index", material_index)
+        mesh.polygons.foreach_get("loop_total", loop_total)
+
+    key = (
+        obj.name, mesh.name, pixel_digest(material_index), pixel_digest(loop_total),
+        tuple(enabled), tuple(mesh.materials[i].name for i in enabled),
+        tuple(sorted(sources.items(), key=str)),
+        layers, textures_per_material, halve_every, min_size, atlas_max_size,
+    )
+    if key in _estimate_cache:
+        return _estimate_cache[key]
+
+    triangles = 0
+    if enabled and len(mesh.polygons):
+        tris = np.bincount(material_index, weights=loop_total - 2, minlength=len(mesh.materials))
+        triangles = int(sum(tris[i] for i in enabled)) * layers
+
+    if atlas:
+        cols, rows = atlas_grid(layers)
+        texture_bytes = sum(
+            cell_width * cols * cell_height * rows * 4
+            for width, height in sources.values()
+            for cell_width, cell_height in [
+                atlas_cell_size(*shrunk_size(width, height, atlas_shrink(width, height, layers, atlas_max_size)))
+            ]
+        )
+    else:
+        texture_bytes = sum(
+            layer_width * layer_height * 4
+            for width, height in sources.values()
+            for layer_width, layer_height in (
+                shrunk_size(width, height, layer_shrink(layer, width, height, halve_every, min_size))
+                for layer in range(textures_per_material)
+            )
+        )
+
+    estimate = {
+        "triangles": triangles,
+        "material_slots": len(enabled) * (1 if atlas else layers),
+        "textures": len(sources) * textures_per_material,
+        "texture_bytes": texture_bytes,
+    }
+    if len(_estimate_cache) > 64:
+        _estimate_cache.clear()
+    _estimate_cache[key] = estimate
+    return estimate
+
+
+def publish_build_stats(scene, stats):
+    """Make stats available to build pipelines as a dict, a scene property and optionally a JSON file.
+
+    Returns an error message if the JSON file could not be written, else None.
+    """
+    last_build_stats.clear()
+    last_build_stats.update(stats)
+
+    text = json.dumps(stats, indent=2)
+    scene["shell_last_build_stats"] = text
+
+    if scene.shell_stats_path:
+        path = bpy.path.abspath(scene.shell_stats_path)
+        try:
+            with open(path, "w") as f:
+                f.write(text)
+        except OSError as e:
+            return f"Could not write shell build stats to {path}: {e}"
+    return None
+
+
+# ------------------------------------------------------------
+# Shell build
+# ------------------------------------------------------------
+
+class ShellBuildError(Exception):
+    """A shell build cannot run for an object; the message is shown to the user"""
+
+
+def build_shell_fur(context, obj):
+    """Add or update shell texturing on the mesh obj with the scene settings.
+
+    Noise, textures and node groups are shared with other objects built with
+    the same inputs. Returns the build statistics; raises ShellBuildError if
+    there is nothing to build.
+    """
+    return run_steps(shell_build_steps(context.scene, context.view_layer, obj))
+
+
+def shell_build_steps(scene, view_layer, obj):
+    """Step generator behind build_shell_fur, yielding (progress, message) for the modal operator.
+
+    Closing it before all textures exist leaves obj's shell slots as they were.
+    """
+    timer = StageTimer()
+
+    checked_indices = enabled_material_indices(obj)
+
+    if not checked_indices:
+        raise ShellBuildError("No materials enabled.")
+
+    layers = scene.shell_layers
+    pattern = scene.shell_texture_pattern
+    params = scene_pattern_params(scene)
+    atlas = scene.shell_atlas
+    use_cutoff = scene.shell_alpha_cutoff and not atlas
+    tile_rows = scene.shell_tile_rows
+    texture_count = 1 if use_cutoff or atlas else layers
+    shell_count = 1 if atlas else layers  # shell materials per base material
+    cache = get_shell_cache(scene)
+    storage_dir = shell_storage_dir(scene)
+    if storage_dir.startswith("//") and not bpy.data.filepath:
+        raise ShellBuildError("Save the .blend file first to store shell textures next to it.")
+    halve_every = 0 if use_cutoff or atlas else scene.shell_downsample_every
+    min_size = scene.shell_downsample_min
+
+    # ------------------------------------------------------------
+    # Noise image (binary, alpha only)
+    # ------------------------------------------------------------
+
+    noise_seed = scene.shell_noise_seed
+    with timer.stage("noise"):
+        img = get_hair_noise_image(noise_seed, scene.shell_noise_resolution)
+
+    # ------------------------------------------------------------
+    # Create shell materials (MToon) - one per layer
+    # ------------------------------------------------------------
+
+    shell_mats = {}  # idx: [mat_layer0, mat_layer1, ...]
+    slot_starts = {}  # idx: start_slot for its shell mats
+    layer_info = {}  # idx: (source key, then texture name, deletion ratio, texture fingerprint per layer)
+    base_digests = {}  # base image name: pixel digest
+    planned_textures = set()  # texture names used by this run
+    outdated = {}  # texture name: image still holding that name, swapped out once its replacement exists
+    texture_jobs = []  # textures still to generate, see iter_shell_textures_parallel
+    tiled_jobs = []  # same, generated in row tiles instead
+    atlas_jobs = []  # (base_image, atlas name, deletion ratios, noise_vals, shrink)
+    jobs = tiled_jobs if tile_rows else texture_jobs
+
+    for i, idx in enumerate(checked_indices):
+        base = obj.data.materials[idx]
+        yield 0.1 * i / len(checked_indices), f"Preparing {base.name}"
+        base_image = get_base_image(base)
+
+        if not base_image:
+            # Untextured materials all share one white mask set; their color
+            # is applied by base_color_factor, copied to the shell materials
+            base_image = get_solid_color_image()
+
+        width, height = base_image.size
+        if atlas:
+            shrinks = [atlas_shrink(width, height, layers, scene.shell_atlas_max_size)]
+        else:
+            shrinks = [layer_shrink(layer, width, height, halve_every, min_size) for layer in range(texture_count)]
+
+        # Textures are keyed by base pixels and parameters, not by material,
+        # so materials and objects with identical inputs share one set
+        if base_image.name not in base_digests:
+            base_digests[base_image.name] = image_digest(base_image)
+        material_seed = derive_seed(noise_seed, base_digests[base_image.name])
+
+        deletion_ratios = layer_deletion_ratios(layers)
+
+        # Everything the textures depend on except the deletion ratio
+        source_key = shell_fingerprint(
+            base_pixels=base_digests[base_image.name],
+            pattern=pattern,
+            params=pattern_key_params(pattern, params),
+            seed=material_seed,
+            noise=(noise_seed, tuple(img.size)) if PATTERNS[pattern].hair_noise else None,
+            version=CACHE_VERSION,
+        )[:12]
+
+        # Names carry the texture fingerprint, so builds with other layer
+        # counts or downsampling never claim textures another object uses
+        if use_cutoff:
+            # One shared texture, layers differ only by alpha cutoff
+            texture_fingerprints = [shell_fingerprint(source=source_key, cutoff=True)] * layers
+            shell_texture_names = [f"ShellTex_{source_key}"] * layers
+        elif atlas:
+            # One texture with a tile per layer, see atlas_grid
+            texture_fingerprints = [
+                shell_fingerprint(source=source_key, atlas=deletion_ratios, shrink=shrinks[0], gutter=ATLAS_GUTTER)
+            ] * layers
+            shell_texture_names = [f"ShellTex_{source_key}_atlas_{texture_fingerprints[0][:8]}"] * layers
+        else:
+            texture_fingerprints = [
+                shell_fingerprint(source=source_key, deletion_ratio=ratio, shrink=shrink)
+                for ratio, shrink in zip(deletion_ratios, shrinks)
+            ]
+            shell_texture_names = [f"ShellTex_{source_key}_{fingerprint[:8]}" for fingerprint in texture_fingerprints]
+
+        # Regenerate only textures that are missing or were built with other
+        # parameters, and only once per run when materials share them
+        missing = []
+        for layer in range(texture_count):
+            name = shell_texture_names[layer]
+            if name in planned_textures:
+                continue
+            planned_textures.add(name)
+            shell_img = bpy.data.images.get(name)
+            if is_current(shell_img, texture_fingerprints[layer]) and has_shell_pixels(shell_img):
+                continue
+            if shell_img:
+                # May still be used (e.g. its file went missing): generate the
+                # replacement under another name and swap it in afterwards, so
+                # a cancelled build leaves existing shells intact
+                outdated[name] = shell_img
+            missing.append(layer)
+
+        # Name each missing texture is generated under
+        job_names = [f"{name}_new" if name in outdated else name for name in shell_texture_names]
+
+        if atlas and missing:
+            with timer.stage("noise"):
+                noise_vals = noise_map(material_seed, width, height, pattern, params, shrinks[0])
+            atlas_jobs.append((base_image, job_names[0], deletion_ratios, noise_vals, shrinks[0]))
+            missing = []
+
+        # Generate all missing layers of one size in one pass
+        for shrink in sorted({shrinks[layer] for layer in missing}):
+            group = [layer for layer in missing if shrinks[layer] == shrink]
+
+            # Noise values are regenerated from the seed where the layers are
+            # generated: in a pool worker, in-process or per tile
+            jobs.append((
+                base_image,
+                [job_names[layer] for layer in group],
+                None if use_cutoff else [deletion_ratios[layer] for layer in group],
+                material_seed,
+                shrink,
+            ))
+
+        layer_info[idx] = (source_key, shell_texture_names, deletion_ratios, texture_fingerprints)
+
+    with timer.stage("textures"):
+        generated = 0
+        total = sum(len(job[1]) for job in jobs) + sum(len(job[2]) for job in atlas_jobs) or 1
+        for base_image, atlas_name, job_ratios, noise_vals, shrink in atlas_jobs:
+            with timer.stage(f"textures:{base_image.name}"):
+                for created in iter_shell_atlas(
+                    base_image, atlas_name, job_ratios, img, noise_vals, pattern, cache, shrink, params,
+                ):
+                    generated += created
+                    yield 0.1 + 0.6 * generated / total, f"Generating atlas for {base_image.name}"
+
+        for base_image, shell_names, job_ratios, material_seed, shrink in tiled_jobs:
+            with timer.stage(f"textures:{base_image.name}"):
+                for created in iter_shell_textures_tiled(
+                    base_image, shell_names, job_ratios,
+                    noise_image=img, noise_seed=material_seed, pattern=pattern, tile_rows=tile_rows, shrink=shrink,
+                    params=params,
+                ):
+                    generated += created
+                    yield 0.1 + 0.6 * generated / total, f"Generating textures for {base_image.name}"
+
+        for created in iter_shell_textures_parallel(
+            texture_jobs,
+            noise_image=img,
+            pattern=pattern,
+            cache=cache,
+            workers=scene.shell_workers or os.cpu_count() or 1,
+            timer=timer,
+            params=params,
+        ):
+            generated += created
+            yield 0.1 + 0.6 * generated / total, f"Generating textures ({int(generated)}/{total})"
+
+    # Point every user of an outdated texture at its replacement; only then
+    # is the outdated image unused and safe to remove
+    for name, shell_img in outdated.items():
+        new_img = bpy.data.images[f"{name}_new"]
+        shell_img.user_remap(new_img)
+        bpy.data.images.remove(shell_img)
+        new_img.name = name
+
+    # Also moves textures kept from earlier runs to the current storage mode
+    with timer.stage("storage"):
+        for i, name in enumerate(sorted(planned_textures)):
+            yield 0.7 + 0.1 * i / len(planned_textures), f"Storing {name}"
+            store_shell_image(bpy.data.images[name], storage_dir)
+
+    # Shell slots from a previous run are rebuilt below
+    remove_shell_slots(obj)
+
+    with timer.stage("materials"):
+        for i, idx in enumerate(checked_indices):
+            base = obj.data.materials[idx]
+            yield 0.8 + 0.1 * i / len(checked_indices), f"Setting up materials for {base.name}"
+            source_key, shell_texture_names, deletion_ratios, texture_fingerprints = layer_info[idx]
+
+            for layer in range(texture_count):
+                tag_shell_data(bpy.data.images[shell_texture_names[layer]], source_key, layer, texture_fingerprints[layer])
+
+            shell_list = []
+            for layer in range(shell_count):
+                material_fingerprint = shell_fingerprint(
+                    texture=shell_texture_names[layer],
+                    deletion_ratio=deletion_ratios[layer],
+                    cutoff=use_cutoff,
+                    atlas=atlas,
+                )
+                # Names carry the fingerprint like the textures, so objects and
+                # LOD variants still using materials of other settings keep them
+                name = f"Shell_{base.name}_{layer}_{material_fingerprint[:8]}"
+                shell = bpy.data.materials.get(name)
+                if not is_current(shell, material_fingerprint):
+                    if shell and shell.users == 0:
+                        bpy.data.materials.remove(shell)
+                    # Never re-tag a material in place; a used one keeps its settings
+                    shell = base.copy()
+                    shell.name = name
+                    tag_shell_data(shell, base.name, layer, material_fingerprint)
+
+                if use_cutoff:
+                    enable_mtoon_material(shell, alpha_mode='MASK', alpha_cutoff=max(deletion_ratios[layer], CUTOFF_MIN))
+                else:
+                    enable_mtoon_material(shell)
+
+                shell_img = bpy.data.images.get(shell_texture_names[layer])
+                if shell_img:
+                    try:
+                        shell.vrm_addon_extension.mtoon1.pbr_metallic_roughness.base_color_texture.index.source = shell_img
+                    except:
+                        pass
+
+                # Follow color changes on the base; untextured shells get their color only from here
+                try:
+                    shell.vrm_addon_extension.mtoon1.pbr_metallic_roughness.base_color_factor = \
+                        base.vrm_addon_extension.mtoon1.pbr_metallic_roughness.base_color_factor
+                except:
+                    pass
+
+                # Set blend method (MASK materials are configured by the VRM add-on)
+                if not use_cutoff:
+                    shell.blend_method = 'BLEND'
+
+                shell_list.append(shell)
+
+            shell_mats[idx] = shell_list
+
+            # Drop layers beyond the new count
+            remove_unused_shell_materials(base.name, {shell.name for shell in shell_list})
+
+        # Drop textures of old parameters or of the other mode
+        remove_unused_shell_images(planned_textures)
+
+    # ------------------------------------------------------------
+    # Add shell materials to object slots
+    # ------------------------------------------------------------
+
+    current_slot = len(obj.data.materials)
+    for idx in checked_indices:
+        slot_starts[idx] = current_slot
+        for shell_mat in shell_mats[idx]:
+            obj.data.materials.append(shell_mat)
+        current_slot += shell_count
+
+    # ------------------------------------------------------------
+    # Geometry Nodes
+    # ------------------------------------------------------------
+
+    yield 0.9, "Building node graph"
+    with timer.stage("node_graph"):
+        gn = get_shell_node_group(checked_indices, slot_starts, scene)
+
+    mod = obj.modifiers.get("Shell Fur")
+    if mod is None:
+        mod = obj.modifiers.new("Shell Fur", 'NODES')
+    if mod.node_group != gn:
+        # Switching groups resets the inputs; keep a tweaked thickness
+        thickness = get_modifier_input(mod, "Thickness") if mod.node_group else None
+        mod.node_group = gn
+        if thickness is not None:
+            set_modifier_input(mod, "Thickness", thickness)
+    set_modifier_input(mod, "Layers", layers)
+    set_modifier_input(mod, "Density Threshold", scene.shell_density_threshold)
+
+    # Shell data of materials that are no longer enabled, or of objects
+    # whose shells were removed, is not reused by later builds
+    reclaimed = purge_unused_shell_data()
+
+    yield 0.95, "Evaluating modifier"
+    with timer.stage("modifier_eval"):
+        view_layer.update()
+        obj.evaluated_get(view_layer.depsgraph)
+
+    stats = timer.as_dict()
+    stats["object"] = obj.name
+    stats["layers"] = layers
+    stats["materials"] = [obj.data.materials[idx].name for idx in checked_indices]
+    stats["estimate"] = estimate_shell_cost(obj, scene)
+    stats["reclaimed_bytes"] = reclaimed
+    return stats
+
+
+def shell_data_snapshot():
+    """Names of the images, materials and node groups that exist right now"""
+    return {
+        "images": set(bpy.data.images.keys()),
+        "materials": set(bpy.data.materials.keys()),
+        "node_groups": set(bpy.data.node_groups.keys()),
+    }
+
+
+def remove_cancelled_shell_data(obj, snapshot):
+    """Clean up after a build that was stopped part way.
+
+    Unused images, materials and node groups created since snapshot are
+    removed. If the build had already replaced the shell slots of obj, its
+    Shell Fur modifier no longer matches them and is removed as well.
+    """
+    if obj and not shell_slot_layout(obj) and "Shell Fur" in obj.modifiers:
+        obj.modifiers.remove(obj.modifiers["Shell Fur"])
+
+    for collection, names in (
+        (bpy.data.materials, snapshot["materials"]),
+        (bpy.data.node_groups, snapshot["node_groups"]),
+        (bpy.data.images, snapshot["images"]),
+    ):
+        for block in list(collection):
+            if block.name not in names and block.users == 0:
+                collection.remove(block)
+
+
+# ------------------------------------------------------------
+# Operator
+# ------------------------------------------------------------
+
+# From the UI the build runs modal: it advances in short time slices on a
+# timer, shows its progress and can be cancelled with Esc. From a script
+# (execute) it blocks until done.
+class ShellTexturingOperator(bpy.types.Operator):
+    bl_idname = "object.add_shell_texturing"
+    bl_label = "Add Shell Texturing (MToon)"
+    bl_options = {'REGISTER', 'UNDO'}
+    bl_description = "Add shell fur to the active mesh; press Esc while it builds to cancel"
+
+    _timer = None
+    _steps = None
+    _snapshot = None
+    _object_name = ""
+    _workspace = None
+
+    def execute(self, context):
+        obj = context.active_object
+        if not obj or obj.type != 'MESH':
+            self.report({'ERROR'}, "Select a mesh object.")
+            return {'CANCELLED'}
+
+        try:
+            stats = build_shell_fur(context, obj)
+        except ShellBuildError as e:
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        self.finish_build(context, stats)
+        return {'FINISHED'}
+
+    def invoke(self, context, event):
+        obj = context.active_object
+        if not obj or obj.type != 'MESH':
+            self.report({'ERROR'}, "Select a mesh object.")
+            return {'CANCELLED'}
+        if not enabled_material_indices(obj):
+            self.report({'ERROR'}, "No materials enabled.")
+            return {'CANCELLED'}
+
+        self._object_name = obj.name
+        self._snapshot = shell_data_snapshot()
+        self._steps = shell_build_steps(context.scene, context.view_layer, obj)
+        self._workspace = context.workspace
+
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.05, window=context.window)
+        wm.progress_begin(0, 100)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self._steps.close()
+            remove_cancelled_shell_data(bpy.data.objects.get(self._object_name), self._snapshot)
+            self.end_modal(context)
+            self.report({'WARNING'}, "Shell texturing cancelled.")
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            # Allow viewport navigation, but no edits while building
+            if event.type in {'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE'}:
+                return {'PASS_THROUGH'}
+            return {'RUNNING_MODAL'}
+
+        # Run steps for a short slice of time, then hand control back to the UI
+        deadline = time.perf_counter() + 0.1
+        try:
+            while time.perf_counter() < deadline:
+                progress, message = next(self._steps)
+        except StopIteration as done:
+            self.end_modal(context)
+            self.finish_build(context, done.value)
+            return {'FINISHED'}
+        except ShellBuildError as e:
+            self.end_modal(context)
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+        except Exception:
+            # e.g. OSError while storing textures: clean up like a cancel, keep the traceback
+            remove_cancelled_shell_data(bpy.data.objects.get(self._object_name), self._snapshot)
+            self.end_modal(context)
+            raise
+
+        context.window_manager.progress_update(int(progress * 100))
+        self._workspace.status_text_set(f"Shell texturing: {message} ({progress:.0%}), Esc to cancel")
+        return {'RUNNING_MODAL'}
+
+    def end_modal(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        self._workspace.status_text_set(None)
+
+    def finish_build(self, context, stats):
+        error = publish_build_stats(context.scene, stats)
+        if error:
+            self.report({'WARNING'}, error)
+
+        slowest = max(stats["stages"], key=stats["stages"].get)
+        self.report({'INFO'}, f"Shell texturing with MToon materials created in {stats['total']:.2f}s (slowest: {slowest})")
+
+
+# ------------------------------------------------------------
+# Operator: Batch shell texturing
+# ------------------------------------------------------------
+
+def batch_shell_objects(context, scope):
+    """Meshes a batch build covers: the selection, or all meshes of the chosen VRM armature"""
+    if scope == 'ARMATURE':
+        armature = context.scene.shell_batch_armature
+        if not armature:
+            return []
+        objects = armature.children_recursive
+    else:
+        objects = context.selected_objects
+    return [obj for obj in objects if obj.type == 'MESH']
+
+
+class ShellTexturingBatchOperator(bpy.types.Operator):
+    bl_idname = "object.add_shell_texturing_batch"
+    bl_label = "Add Shell Texturing to All"
+    bl_options = {'REGISTER', 'UNDO'}
+    bl_description = "Add shell texturing to every selected mesh, or every mesh of a VRM armature"
+
+    scope: bpy.props.EnumProperty(
+        name="Objects",
+        items=(
+            ('SELECTED', "Selected Meshes", "All selected mesh objects"),
+            ('ARMATURE', "Armature Meshes", "All meshes under the chosen VRM armature"),
+        ),
+        default='SELECTED'
+    )
+
+    def execute(self, context):
+        objects = batch_shell_objects(context, self.scope)
+        if not objects:
+            self.report({'ERROR'}, "No mesh objects to process.")
+            return {'CANCELLED'}
+
+        timer = StageTimer()
+        results = []
+        skipped = []
+        for obj in objects:
+            if not obj.vrm_shell_materials:
+                sync_material_list(obj)
+            try:
+                results.append(build_shell_fur(context, obj))
+            except ShellBuildError:
+                skipped.append(obj.name)
+
+        stats = timer.as_dict()
+        stats["objects"] = results
+        stats["skipped"] = skipped
+        error = publish_build_stats(context.scene, stats)
+        if error:
+            self.report({'WARNING'}, error)
+
+        self.report({'INFO'}, f"Shell texturing added to {len(results)} object(s) in {stats['total']:.2f}s, {len(skipped)} skipped")
+        return {'FINISHED'}
+
+
+# ------------------------------------------------------------
+# Operator: Shell LOD variants
+# ------------------------------------------------------------
+
+class ShellLODOperator(bpy.types.Operator):
+    bl_idname = "object.shell_lod_variants"
+    bl_label = "Create Shell LOD Variants"
+    bl_options = {'REGISTER', 'UNDO'}
+    bl_description = "Create copies of the active object using an evenly spaced subset of its shell layers"
+
+    levels: bpy.props.StringProperty(
+        name="Layer Counts",
+        description="Comma separated layer counts, one variant each",
+        default="16,8,4"
+    )
+    realize: bpy.props.BoolProperty(
+        name="Realize Geometry",
+        description="Bake the shells into each variant's mesh for export",
+        default=False
+    )
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        obj = context.active_object
+        if not obj or obj.type != 'MESH' or "Shell Fur" not in obj.modifiers:
+            self.report({'ERROR'}, "Select a mesh with shell texturing.")
+            return {'CANCELLED'}
+
+        try:
+            levels = sorted({int(level) for level in self.levels.split(",") if level.strip()}, reverse=True)
+        except ValueError:
+            self.report({'ERROR'}, "Layer counts must be comma separated integers.")
+            return {'CANCELLED'}
+
+        layout = shell_slot_layout(obj)
+        if not layout:
+            self.report({'ERROR'}, "No shell materials found on the object.")
+            return {'CANCELLED'}
+
+        source_mod = obj.modifiers["Shell Fur"]
+        built = min(len(shells) for shells in layout.values())
+        if built == 1 and get_modifier_input(source_mod, "Layers", 1) > 1:
+            self.report({'ERROR'}, "LOD variants need one shell material per layer; rebuild without Layer Atlas.")
+            return {'CANCELLED'}
+        thickness = get_modifier_input(source_mod, "Thickness", 0.005)
+        if not source_mod.node_group or not has_shell_slot_nodes(source_mod.node_group, sorted(layout)):
+            self.report({'ERROR'}, "The shell node group is from an older version; rebuild shell texturing first.")
+            return {'CANCELLED'}
+
+        created = []
+        for count in levels:
+            if count < 1 or count >= built:
+                continue
+
+            variant = obj.copy()
+            variant.data = obj.data.copy()
+            variant.name = f"{obj.name}_LOD{count}"
+            for collection in obj.users_collection:
+                collection.objects.link(variant)
+
+            # Keep an evenly spaced subset of the built layers
+            remove_shell_slots(variant)
+            checked_indices = sorted(layout)
+            slot_starts = {}
+            for idx in checked_indices:
+                slot_starts[idx] = len(variant.data.materials)
+                for layer in lod_layer_indices(built, count):
+                    variant.data.materials.append(layout[idx][layer])
+
+            # Same graph as the source object, whatever the scene settings are now
+            gn = get_shell_variant_node_group(source_mod.node_group, checked_indices, slot_starts, count)
+
+            mod = variant.modifiers["Shell Fur"]
+            mod.node_group = gn
+            set_modifier_input(mod, "Layers", count)
+            # Same total fur height with fewer, wider spaced layers
+            set_modifier_input(mod, "Thickness", thickness * built / count)
+
+            if self.realize:
+                realize_shell_modifier(context, variant)
+
+            created.append(variant.name)
+
+        if not created:
+            self.report({'ERROR'}, f"No layer count below the {built} built layers.")
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, f"Created {len(created)} LOD variant(s): {', '.join(created)}")
+        return {'FINISHED'}
+
+
+# ------------------------------------------------------------
+# Operator: Remove shell texturing
+# ------------------------------------------------------------
+
+class RemoveShellTexturingOperator(bpy.types.Operator):
+    bl_idname = "object.remove_shell_texturing"
+    bl_label = "Remove Shell Texturing"
+    bl_options = {'REGISTER', 'UNDO'}
+    bl_description = "Remove shell slots and the Shell Fur modifier from the selected meshes and purge unused shell data"
+
+    def execute(self, context):
+        objects = {obj for obj in context.selected_objects if obj.type == 'MESH'}
+        if context.active_object and context.active_object.type == 'MESH':
+            objects.add(context.active_object)
+
+        for obj in objects:
+            remove_shell_slots(obj)
+            if "Shell Fur" in obj.modifiers:
+                obj.modifiers.remove(obj.modifiers["Shell Fur"])
+
+        reclaimed = purge_unused_shell_data(include_sources=True)
+
+        self.report({'INFO'}, f"Removed shell texturing from {len(objects)} object(s), reclaimed {reclaimed / (1024 * 1024):.1f} MB")
+        return {'FINISHED'}
+
+
+# ------------------------------------------------------------
+# Operator: Pack shell textures for export
+# ------------------------------------------------------------
+
+class PackShellTexturesOperator(bpy.types.Operator):
+    bl_idname = "object.pack_shell_textures"
+    bl_label = "Pack Shell Textures"
+    bl_options = {'REGISTER', 'UNDO'}
+    bl_description = "Pack all externally stored shell textures into the .blend, e.g. before sharing or exporting it"
+
+    def execute(self, context):
+        packed = 0
+        for img in bpy.data.images:
+            if "shell_base" in img and not img.packed_file and has_shell_pixels(img):
+                img.pack()
+                packed += 1
+
+        self.report({'INFO'}, f"Packed {packed} shell texture(s).")
+        return {'FINISHED'}
+
+
+# ------------------------------------------------------------
+# Operator for turning off outline
+# ------------------------------------------------------------
+
+class TurnOffOutlineOperator(bpy.types.Operator):
+    bl_idname = "object.turn_off_outline"
+    bl_label = "Turn Off Outline"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        obj = context.active_object
+        if not obj or obj.type != 'MESH':
+            self.report({'ERROR'}, "Select a mesh object.")
+            return {'CANCELLED'}
+
+        # Get checked materials only
+        checked_materials = [
+            item.material for item in obj.vrm_shell_materials
+            if item.use_shell and item.material
+        ]
+
+        if not checked_materials:
+            self.report({'ERROR'}, "No materials enabled.")
+            return {'CANCELLED'}
+
+        # Turn off outlines only for the checked materials (not shell materials)
+        count = 0
+        for mat in checked_materials:
+            try:
+                mat.vrm_addon_extension.mtoon1.extensions.vrmc_materials_mtoon.outline_width_mode = 'none'
+                mat.vrm_addon_extension.mtoon1.extensions.vrmc_materials_mtoon.outline_width_factor = 0.0
+                count += 1
+            except:
+                pass
+
+        self.report({'INFO'}, f"Outlines turned off for {count} material(s)!")
+        return {'FINISHED'}
+
+
+# ------------------------------------------------------------
+# UI
+# ------------------------------------------------------------
+
+class ShellTexturingPanel(bpy.types.Panel):
+    bl_label = "VRM Hair Shell Texturing (MToon)"
+    bl_idname = "OBJECT_PT_vrm_shell_mtoon"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = "VRM"
+
+    def draw(self, context):
+        layout = self.layout
+        obj = context.active_object
+
+        if not obj or obj.type != 'MESH':
+            layout.label(text="Select a mesh")
+            return
+
+        layout.prop(context.scene, "shell_layers")
+        layout.prop(context.scene, "shell_taper_axis")
+        layout.prop(context.scene, "shell_taper_invert")
+        layout.prop(context.scene, "shell_texture_pattern")
+        pattern_params = PATTERNS[context.scene.shell_texture_pattern].params
+        if pattern_params:
+            col = layout.column(align=True)
+            for name in pattern_params:
+                col.prop(context.scene, f"shell_{name}")
+        layout.prop(context.scene, "shell_graph_layout")
+
+        layout.prop(context.scene, "shell_density_source")
+        if context.scene.shell_density_source != 'NONE':
+            col = layout.column(align=True)
+            if context.scene.shell_density_source == 'VERTEX_GROUP':
+                col.prop_search(context.scene, "shell_density_attribute", obj, "vertex_groups")
+            elif context.scene.shell_density_source == 'COLOR_ATTRIBUTE':
+                col.prop_search(context.scene, "shell_density_attribute", obj.data, "color_attributes")
+            else:
+                col.prop(context.scene, "shell_density_image")
+            col.prop(context.scene, "shell_density_threshold")
+            col.prop(context.scene, "shell_density_progressive")
+        layout.prop(context.scene, "shell_atlas")
+        if context.scene.shell_atlas:
+            layout.prop(context.scene, "shell_atlas_max_size")
+        else:
+            layout.prop(context.scene, "shell_alpha_cutoff")
+            if not context.scene.shell_alpha_cutoff:
+                row = layout.row(align=True)
+                row.prop(context.scene, "shell_downsample_every")
+                row.prop(context.scene, "shell_downsample_min")
+        row = layout.row(align=True)
+        row.prop(context.scene, "shell_noise_seed")
+        row.prop(context.scene, "shell_noise_resolution")
+
+        layout.prop(context.scene, "shell_workers")
+        layout.prop(context.scene, "shell_tile_rows")
+
+        layout.prop(context.scene, "shell_texture_storage")
+        if context.scene.shell_texture_storage == 'EXTERNAL':
+            row = layout.row(align=True)
+            row.prop(context.scene, "shell_texture_dir", text="")
+            row.operator("object.pack_shell_textures", text="", icon='PACKAGE')
+
+        layout.prop(context.scene, "shell_cache_enabled")
+        if context.scene.shell_cache_enabled:
+            col = layout.column(align=True)
+            col.prop(context.scene, "shell_cache_dir")
+            col.prop(context.scene, "shell_cache_size")
+
+        box = layout.box()
+        box.label(text="Shell Materials")
+        
+        # Add refresh button
+        box.operator("object.sync_shell_materials", icon='FILE_REFRESH')
+
+        for item in obj.vrm_shell_materials:
+            if item.material:
+                row = box.row()
+                row.prop(item, "use_shell", text="")
+                row.label(text=item.material.name)
+
+        estimate = estimate_shell_cost(obj, context.scene)
+        box = layout.box()
+        box.label(text="Estimated Cost", icon='INFO')
+        col = box.column(align=True)
+        col.label(text=f"Triangles: +{estimate['triangles']:,} (at most)")
+        col.label(text=f"Material slots: +{estimate['material_slots']}")
+        col.label(text=f"Textures: {estimate['textures']} ({estimate['texture_bytes'] / (1024 * 1024):.1f} MB)")
+        if last_build_stats.get("object") == obj.name:
+            col.label(text=f"Last build: {last_build_stats['total']:.2f}s")
+        box.prop(context.scene, "shell_stats_path")
+
+        layout.operator("object.add_shell_texturing", icon='MOD_PARTICLES')
+
+        box = layout.box()
+        box.label(text="Batch")
+        box.operator("object.add_shell_texturing_batch", text="Selected Meshes", icon='MOD_PARTICLES').scope = 'SELECTED'
+        row = box.row(align=True)
+        row.prop(context.scene, "shell_batch_armature", text="")
+        row.operator("object.add_shell_texturing_batch", text="Armature Meshes", icon='ARMATURE_DATA').scope = 'ARMATURE'
+
+        layout.operator("object.remove_shell_texturing", icon='TRASH')
+        layout.operator("object.turn_off_outline", icon='CANCEL')
+        layout.operator("object.shell_lod_variants", icon='MOD_DECIM')
+
+
+# ------------------------------------------------------------
+# Registration
+# ------------------------------------------------------------
+
+classes = (
+    VRMShellMaterialItem,
+    SyncMaterialsOperator,
+    ShellTexturingOperator,
+    ShellTexturingBatchOperator,
+    TurnOffOutlineOperator,
+    ShellLODOperator,
+    RemoveShellTexturingOperator,
+    PackShellTexturesOperator,
+    ShellTexturingPanel,
+)
+
+def register():
+    for cls in classes:
+        bpy.utils.register_class(cls)
+
+    bpy.types.Object.vrm_shell_materials = bpy.props.CollectionProperty(
+        type=VRMShellMaterialItem
+    )
+
+    bpy.types.Scene.shell_layers = bpy.props.IntProperty(
+        name="Layers", default=10, min=1, max=64
+    )
+
+    bpy.types.Scene.shell_taper_axis = bpy.props.EnumProperty(
+        name="Taper Axis",
+        items=(('Y', "V (Y)", "Use UV V coordinate for tapering"), ('X', "U (X)", "Use UV U coordinate for tapering")),
+        default='X'
+    )
+
+    bpy.types.Scene.shell_taper_invert = bpy.props.BoolProperty(
+        name="Invert Taper Direction",
+        default=False
+    )
+
+    bpy.types.Scene.shell_texture_pattern = bpy.props.EnumProperty(
+        name="Texture Pattern",
+        items=pattern_enum_items(),
+        default='RANDOM'
+    )
+
+    # One setting per pattern parameter, shown under the patterns using it
+    for param in PATTERN_PARAMS.values():
+        setattr(bpy.types.Scene, f"shell_{param.name}", bpy.props.FloatProperty(
+            name=param.label,
+            description=param.description,
+            default=param.default, min=param.minimum, max=param.maximum,
+            subtype=param.subtype, precision=param.precision
+        ))
+
+    bpy.types.Scene.shell_graph_layout = bpy.props.EnumProperty(
+        name="Graph Layout",
+        items=(
+            ('PER_MATERIAL', "Per Material", "A separate shell loop for each material"),
+            ('FLAT', "Flat", "One shell loop for all materials; evaluation cost stays flat as materials are added"),
+        ),
+        default='PER_MATERIAL'
+    )
+
+    bpy.types.Scene.shell_density_source = bpy.props.EnumProperty(
+        name="Fur Density",
+        items=(
+            ('NONE', "None", "Shells on every face of the enabled materials"),
+            ('VERTEX_GROUP', "Vertex Group", "Fur density from a vertex group"),
+            ('COLOR_ATTRIBUTE', "Color Attribute", "Fur density from a color attribute (grayscale)"),
+            ('TEXTURE', "Texture", "Fur density from an image sampled with UVMap (grayscale)"),
+        ),
+        default='NONE'
+    )
+
+    bpy.types.Scene.shell_density_attribute = bpy.props.StringProperty(
+        name="Density Attribute",
+        description="Vertex group or color attribute holding the fur density"
+    )
+
+    bpy.types.Scene.shell_density_image = bpy.props.PointerProperty(
+        name="Density Texture",
+        type=bpy.types.Image
+    )
+
+    bpy.types.Scene.shell_density_threshold = bpy.props.FloatProperty(
+        name="Density Threshold",
+        description="Faces with a lower average density get no shells",
+        default=0.5, min=0.0, max=1.0
+    )
+
+    bpy.types.Scene.shell_density_progressive = bpy.props.BoolProperty(
+        name="Thin Outer Layers",
+        description="Require more density for outer layers, so sparse areas get fewer shells",
+        default=False
+    )
+
+    bpy.types.Scene.shell_alpha_cutoff = bpy.props.BoolProperty(
+        name="Shared Alpha Cutoff Texture",
+        description="Use one texture per material for all layers, with MToon alpha cutoff per layer instead of a texture per layer",
+        default=False
+    )
+
+    bpy.types.Scene.shell_noise_seed = bpy.props.IntProperty(
+        name="Noise Seed",
+        description="Seed for all shell noise; the same seed and settings give the same textures",
+        default=0, min=0
+    )
+
+    bpy.types.Scene.shell_noise_resolution = bpy.props.IntProperty(
+        name="Noise Resolution",
+        description="Size of the tiled VRMHairNoise image used by the Random pattern",
+        default=512, min=16, max=4096
+    )
+
+    bpy.types.Scene.shell_atlas = bpy.props.BoolProperty(
+        name="Layer Atlas",
+        description="One shell material per base material, with all layers tiled in one atlas texture; draw calls no longer grow with the layer count. "
+                    "UVs are clamped to 0..1, so shells of textures that repeat outside that range look different",
+        default=False
+    )
+
+    bpy.types.Scene.shell_atlas_max_size = bpy.props.IntProperty(
+        name="Atlas Max Size",
+        description="Layer tiles are downsampled until the atlas fits this size",
+        default=4096, min=64, max=16384
+    )
+
+    bpy.types.Scene.shell_downsample_every = bpy.props.IntProperty(
+        name="Halve Every",
+        description="Halve the texture resolution every this many layers; outer layers are mostly transparent (0 = full resolution for all layers)",
+        default=0, min=0, max=64
+    )
+
+    bpy.types.Scene.shell_downsample_min = bpy.props.IntProperty(
+        name="Min Size",
+        description="Downsampled shell textures stay at least this large on their shorter side",
+        default=128, min=1, max=8192
+    )
+
+    bpy.types.Scene.shell_stats_path = bpy.props.StringProperty(
+        name="Stats File",
+        description="Also write the timings of each build to this JSON file",
+        subtype='FILE_PATH',
+        default=""
+    )
+
+    bpy.types.Scene.shell_texture_storage = bpy.props.EnumProperty(
+        name="Texture Storage",
+        items=(
+            ('PACKED', "Packed", "Pack shell textures into the .blend file"),
+            ('EXTERNAL', "External PNG", "Save shell textures as 8-bit PNG files next to the .blend; keeps saving and undo fast"),
+        ),
+        default='PACKED'
+    )
+
+    bpy.types.Scene.shell_texture_dir = bpy.props.StringProperty(
+        name="Texture Directory",
+        description="Directory for external shell textures, relative to the .blend file if it starts with //",
+        subtype='DIR_PATH',
+        default="//shell_textures/"
+    )
+
+    bpy.types.Scene.shell_cache_enabled = bpy.props.BoolProperty(
+        name="Cache Shell Textures",
+        description="Store generated shell layers on disk and reuse them when the inputs match",
+        default=False
+    )
+
+    bpy.types.Scene.shell_cache_dir = bpy.props.StringProperty(
+        name="Cache Directory",
+        description="Directory for cached shell layers (system temp directory if empty)",
+        subtype='DIR_PATH',
+        default=""
+    )
+
+    bpy.types.Scene.shell_cache_size = bpy.props.IntProperty(
+        name="Cache Size (MB)",
+        description="Least recently used layers are evicted beyond this size",
+        default=2048, min=64
+    )
+
+    bpy.types.Scene.shell_workers = bpy.props.IntProperty(
+        name="Worker Processes",
+        description="Processes used to generate shell textures (0 = one per CPU core, 1 = no worker processes)",
+        default=1, min=0, max=64
+    )
+
+    bpy.types.Scene.shell_tile_rows = bpy.props.IntProperty(
+        name="Tile Rows",
+        description="Generate textures in tiles of this many rows, so large textures only hold the base and one layer at full size (0 = whole image at once)",
+        default=0, min=0, max=8192
+    )
+
+    bpy.types.Scene.shell_batch_armature = bpy.props.PointerProperty(
+        name="VRM Armature",
+        description="Armature whose meshes get shell texturing in a batch build",
+        type=bpy.types.Object,
+        poll=lambda self, obj: obj.type == 'ARMATURE'
+    )
+
+def unregister():
+    del bpy.types.Object.vrm_shell_materials
+    del bpy.types.Scene.shell_layers
+    del bpy.types.Scene.shell_taper_axis
+    del bpy.types.Scene.shell_taper_invert
+    del bpy.types.Scene.shell_texture_pattern
+    for name in PATTERN_PARAMS:
+        delattr(bpy.types.Scene, f"shell_{name}")
+    del bpy.types.Scene.shell_graph_layout
+    del bpy.types.Scene.shell_density_source
+    del bpy.types.Scene.shell_density_attribute
+    del bpy.types.Scene.shell_density_image
+    del bpy.types.Scene.shell_density_threshold
+    del bpy.types.Scene.shell_density_progressive
+    del bpy.types.Scene.shell_alpha_cutoff
+    del bpy.types.Scene.shell_noise_seed
+    del bpy.types.Scene.shell_noise_resolution
+    del bpy.types.Scene.shell_workers
+    del bpy.types.Scene.shell_tile_rows
+    del bpy.types.Scene.shell_batch_armature
+    del bpy.types.Scene.shell_atlas
+    del bpy.types.Scene.shell_atlas_max_size
+    del bpy.types.Scene.shell_downsample_every
+    del bpy.types.Scene.shell_downsample_min
+    del bpy.types.Scene.shell_stats_path
+    del bpy.types.Scene.shell_texture_storage
+    del bpy.types.Scene.shell_texture_dir
+    del bpy.types.Scene.shell_cache_enabled
+    del bpy.types.Scene.shell_cache_dir
+    del bpy.types.Scene.shell_cache_size
+
+    for cls in reversed(classes):
+        bpy.utils.unregister_class(cls)
@@ -0,0 +1,194 @@
+"""Batch-generate shell layer PNGs outside Blender.
+
+    python -m shelltexture_vrm INPUT_DIR OUTPUT_DIR --layers 16 --workers 8
+
+For every image in INPUT_DIR this writes NAME_shell_LAYER.png (or
+NAME_shell.png with --cutoff) to OUTPUT_DIR, using the same pixel pipeline,
+noise and layer schedule as the add-on. Reading and writing images needs
+Pillow, which is not required by the add-on itself.
+"""
+
+import argparse
+import concurrent.futures
+import math
+import os
+import sys
+
+import numpy as np
+
+from .core import (
+    PATTERN_PARAMS,
+    PATTERNS,
+    ShellTextureCache,
+    hair_noise_alpha,
+    shell_texture_set,
+    to_uint8,
+)
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tga", ".bmp", ".tif", ".tiff", ".webp")
+
+
+def _pillow_image():
+    try:
+        from PIL import Image
+    except ImportError:
+        raise SystemExit("Reading and writing images needs Pillow: pip install Pillow")
+    return Image
+
+
+def load_rgba(path):
+    """Read an image as float32 RGBA in Blender's row order (bottom row first)"""
+    Image = _pillow_image()
+    with Image.open(path) as img:
+        pixels = np.asarray(img.convert("RGBA"), dtype=np.float32) * np.float32(1.0 / 255.0)
+    return np.ascontiguousarray(pixels[::-1])
+
+
+def save_rgba(path, pixels):
+    """Write float32 RGBA in Blender's row order as an 8-bit PNG"""
+    Image = _pillow_image()
+    Image.fromarray(np.ascontiguousarray(to_uint8(pixels)[::-1]), "RGBA").save(path)
+
+
+def output_stems(paths):
+    """Output name stem per input path, unique even for a.png next to a.jpg"""
+    stems = {}
+    taken = set()
+    names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    for path, name in zip(paths, names):
+        stem = name
+        if names.count(name) > 1:
+            # Keep the extension to tell inputs with the same name apart
+            stem = f"{name}_{os.path.splitext(path)[1][1:].lower()}"
+        unique = stem
+        suffix = 1
+        while unique.lower() in taken:
+            suffix += 1
+            unique = f"{stem}_{suffix}"
+        taken.add(unique.lower())
+        stems[path] = unique
+    return stems
+
+
+def generate_file(path, output_dir, layers=10, pattern='RANDOM', seed=0, noise_resolution=512,
+                  cutoff=False, halve_every=0, min_size=128, cache_dir="", cache_size=2048, params=None, stem=None):
+    """Write the shell layers of one base texture; returns the written paths.
+
+    Output files are named after stem, by default the input name without extension.
+    """
+    stem = stem or os.path.splitext(os.path.basename(path))[0]
+    cache = ShellTextureCache(cache_dir, cache_size * 1024 * 1024) if cache_dir else None
+
+    written = []
+    for layer, pixels in shell_texture_set(
+        load_rgba(path), seed, layers,
+        pattern=pattern,
+        noise_alpha=hair_noise_alpha(seed, noise_resolution),
+        cutoff=cutoff,
+        halve_every=halve_every,
+        min_size=min_size,
+        cache=cache,
+        params=params,
+    ):
+        name = f"{stem}_shell.png" if cutoff else f"{stem}_shell_{layer}.png"
+        out_path = os.path.join(output_dir, name)
+        save_rgba(out_path, pixels)
+        written.append(out_path)
+    return written
+
+
+def _count(minimum):
+    """argparse type for integers of at least minimum"""
+    def parse(value):
+        try:
+            number = int(value)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid integer: {value!r}")
+        if number < minimum:
+            raise argparse.ArgumentTypeError(f"must be at least {minimum}, got {number}")
+        return number
+    return parse
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m shelltexture_vrm",
+        description="Generate shell texture layers for a directory of base textures.",
+    )
+    parser.add_argument("input_dir", help="Directory of base textures")
+    parser.add_argument("output_dir", help="Directory for the generated PNGs, other than input_dir (created if missing)")
+    parser.add_argument("--layers", type=_count(1), default=10, help="Shell layers per texture (default: 10)")
+    parser.add_argument("--pattern", choices=tuple(PATTERNS), default="RANDOM", help="Texture pattern")
+    for param in PATTERN_PARAMS.values():
+        angle = param.subtype == 'ANGLE'
+        users = ", ".join(key for key, kernel in PATTERNS.items() if param.name in kernel.params)
+        parser.add_argument(
+            "--" + param.name.replace("_", "-"), type=float,
+            default=math.degrees(param.default) if angle else param.default,
+            help=f"{param.description}{', in degrees' if angle else ''} ({users})",
+        )
+    parser.add_argument("--seed", type=int, default=0, help="Noise seed, as in the add-on's Noise Seed")
+    parser.add_argument("--noise-resolution", type=_count(1), default=512, help="Size of the tiled hair noise")
+    parser.add_argument("--cutoff", action="store_true", help="Write one alpha-cutoff texture per base instead of one per layer")
+    parser.add_argument("--halve-every", type=_count(0), default=0, help="Halve the resolution every N layers (0 = off)")
+    parser.add_argument("--min-size", type=_count(1), default=128, help="Smallest downsampled size")
+    parser.add_argument("--workers", type=_count(0), default=0, help="Worker processes (0 = one per CPU core)")
+    parser.add_argument("--cache-dir", default="", help="Reuse layers from this shell texture cache directory")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"input_dir {args.input_dir!r} is not a directory")
+    # Outputs written next to the inputs would be read as inputs by the next run
+    if os.path.realpath(args.output_dir) == os.path.realpath(args.input_dir):
+        parser.error("output_dir must differ from input_dir")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    _pillow_image()
+
+    paths = sorted(
+        os.path.join(args.input_dir, name)
+        for name in os.listdir(args.input_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        print(f"No images found in {args.input_dir}", file=sys.stderr)
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    options = dict(
+        layers=args.layers,
+        pattern=args.pattern,
+        seed=args.seed,
+        noise_resolution=args.noise_resolution,
+        cutoff=args.cutoff,
+        halve_every=args.halve_every,
+        min_size=args.min_size,
+        cache_dir=args.cache_dir,
+        params={
+            name: math.radians(getattr(args, name)) if param.subtype == 'ANGLE' else getattr(args, name)
+            for name, param in PATTERN_PARAMS.items()
+        },
+    )
+    workers = args.workers or os.cpu_count() or 1
+
+    failed = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        stems = output_stems(paths)
+        futures = {
+            pool.submit(generate_file, path, args.output_dir, stem=stems[path], **options): path
+            for path in paths
+        }
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future]
+            try:
+                written = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"{path}: {e}", file=sys.stderr)
+                continue
+            print(f"{path}: {len(written)} layer(s)")
+
+    return 1 if failed else 0
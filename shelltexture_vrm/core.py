@@ -0,0 +1,783 @@
+"""Shell texture pixel pipeline without any bpy dependency.
+
+Everything here works on NumPy arrays so it can run in worker processes
+and outside Blender. Arrays follow Blender's layout: (height, width, 4)
+float32 RGBA with the first row at the bottom of the image.
+"""
+
+import contextlib
+import hashlib
+import math
+import os
+import time
+
+import numpy as np
+
+# Smallest alpha cutoff that still hides fully transparent pixels in 8-bit textures
+CUTOFF_MIN = 1.0 / 255.0
+
+# Layer atlas tiles are padded by 1/ATLAS_GUTTER of their size on each side
+ATLAS_GUTTER = 32
+
+
+
+# ------------------------------------------------------------
+# Seeded noise
+# ------------------------------------------------------------
+
+def derive_seed(seed, key):
+    """Derive an independent 64-bit seed from a base seed and a string key"""
+    digest = hashlib.sha1(f"{seed}|{key}".encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+def hair_noise_alpha(seed, size, density=0.25):
+    """Binary (size, size) float32 alpha map with about density of it set"""
+    rng = np.random.Generator(np.random.PCG64(derive_seed(seed, "VRMHairNoise")))
+    return (rng.random((size, size)) < density).astype(np.float32)
+
+
+def base_image_digest(width, height, channels, chunks):
+    """Identify a base image by its size and float32 pixels, fed as row chunks.
+
+    Materials derive their noise seed from this, so equal textures get equal
+    shells inside Blender and in the command line tool.
+    """
+    digest = hashlib.sha1(str((width, height, width * height * channels)).encode())
+    for chunk in chunks:
+        digest.update(np.ascontiguousarray(chunk, dtype=np.float32).data)
+    return digest.hexdigest()
+
+
+def noise_map(seed, width, height, pattern='RANDOM', params=None, shrink=0):
+    """Map of per-pixel deletion values for a width x height texture halved shrink times"""
+    return noise_rows(seed, width, 0, shrunk_size(width, height, shrink)[1], pattern, params, shrink)
+
+
+def noise_rows(seed, width, row_start, row_end, pattern='RANDOM', params=None, shrink=0):
+    """Deletion values for rows [row_start, row_end) of a seeded noise map.
+
+    Any row range reproduces exactly the same values as generating the whole
+    map at once, so tiles can be generated independently. With shrink, rows
+    count at the halved size and each pixel takes the full size value of the
+    first pixel of its block, so downsampled layers stay nested in full size
+    ones.
+    """
+    kernel = PATTERNS[pattern]
+    params = pattern_params(params)
+    if shrink <= 0:
+        return kernel.noise(seed, width, row_start, row_end, params)
+    factor = 1 << shrink
+    out = np.empty((row_end - row_start, -(-width // factor)))
+    for i, row in enumerate(range(row_start * factor, row_end * factor, factor)):
+        out[i] = kernel.noise(seed, width, row, row + 1, params)[0, ::factor]
+    return out
+
+
+def _cell_random(seed, cx, cy, salt=0):
+    """Uniform [0, 1) value per integer cell (cx, cy), the same for any array shape"""
+    cx = np.asarray(cx).astype(np.int64).astype(np.uint64)
+    cy = np.asarray(cy).astype(np.int64).astype(np.uint64)
+    with np.errstate(over='ignore'):
+        h = cx * np.uint64(0x9E3779B97F4A7C15) ^ cy * np.uint64(0xC2B2AE3D27D4EB4F)
+        h = h ^ np.uint64((seed + salt * 0x632BE59BD9B4E019) & 0xFFFFFFFFFFFFFFFF)
+        # splitmix64 finalizer
+        h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        h = h ^ (h >> np.uint64(31))
+    return (h >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+
+
+# ------------------------------------------------------------
+# Pattern kernels
+# ------------------------------------------------------------
+
+class PatternParam:
+    """A float setting of one or more patterns.
+
+    The add-on turns each into a scene property shell_<name> and the command
+    line tool into a --<name> flag. subtype is a Blender property subtype;
+    'ANGLE' values are radians, entered in degrees on the command line.
+    """
+
+    def __init__(self, name, label, description, default, minimum=0.0, maximum=1.0, subtype='NONE', precision=3):
+        self.name = name
+        self.label = label
+        self.description = description
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.subtype = subtype
+        self.precision = precision
+
+
+class PatternKernel:
+    """A fur pattern working on whole row ranges of a texture.
+
+    noise(seed, width, row_start, row_end, params) returns the deletion
+    values of those rows, identical for any split into row ranges.
+    shape(noise_vals, y, width, height, params), if given, returns a factor
+    for the alpha of image rows y. params names the PATTERN_PARAMS the
+    pattern uses; hair_noise patterns are also masked by the tiled hair
+    noise.
+    """
+
+    def __init__(self, key, label, description, noise, shape=None, params=(), hair_noise=False):
+        self.key = key
+        self.label = label
+        self.description = description
+        self.noise = noise
+        self.shape = shape
+        self.params = tuple(params)
+        self.hair_noise = hair_noise
+
+
+PATTERNS = {}
+PATTERN_PARAMS = {}
+
+
+def register_pattern(key, label, description, noise, shape=None, params=(), hair_noise=False):
+    """Add a pattern kernel; the add-on offers patterns in registration order.
+
+    params are the PatternParam the kernel reads; patterns share a setting
+    by passing the same PatternParam.
+    """
+    for param in params:
+        if PATTERN_PARAMS.setdefault(param.name, param) is not param:
+            raise ValueError(f"Pattern parameter {param.name!r} is already registered differently")
+    PATTERNS[key] = PatternKernel(key, label, description, noise, shape, [param.name for param in params], hair_noise)
+    return PATTERNS[key]
+
+
+def pattern_params(params=None):
+    """Defaults of all PATTERN_PARAMS updated with params, as float32 values.
+
+    Blender stores float properties as float32, so rounding here gives the
+    add-on and the command line tool the same values, fingerprints and
+    cache keys.
+    """
+    merged = {name: param.default for name, param in PATTERN_PARAMS.items()}
+    merged.update(params or {})
+    return {name: float(np.float32(value)) for name, value in merged.items()}
+
+
+def pattern_key_params(pattern, params=None):
+    """The params pattern actually uses, for fingerprints and cache keys"""
+    params = pattern_params(params)
+    return {name: params[name] for name in PATTERNS[pattern].params}
+
+
+def pattern_enum_items():
+    """(key, label, description) of every pattern, for enum properties"""
+    return [(kernel.key, kernel.label, kernel.description) for kernel in PATTERNS.values()]
+
+
+def _random_noise(seed, width, row_start, row_end, params):
+    # One 64-bit draw per value, so skipping rows is a cheap generator advance
+    bit_generator = np.random.PCG64(seed).advance(row_start * width)
+    return np.random.Generator(bit_generator).random((row_end - row_start, width))
+
+
+def _column_noise(seed, width, row_start, row_end, params):
+    per_x = np.random.Generator(np.random.PCG64(seed)).random(width)
+    return np.broadcast_to(per_x, (row_end - row_start, width))
+
+
+def _strand_fade(v, noise_vals, height, params):
+    """Alpha factor fading out the tip of each strand along coordinate v"""
+    strand = max(1.0, params["strand_length"] * height)
+    fade_length = max(strand * params["strand_fade"], 1e-6)
+    fade_start = strand - fade_length
+    # Each strand starts at an offset given by its deletion value
+    v_mod = (v + np.floor(noise_vals * strand)) % strand
+    return np.where(v_mod >= fade_start, 1.0 - (v_mod - fade_start) / fade_length, 1.0)
+
+
+def _vertical_shape(noise_vals, y, width, height, params):
+    return _strand_fade(y[:, None], noise_vals, height, params)
+
+
+def _strand_axes(y, width, angle):
+    """Coordinates across (u) and along (v) strands slanted by angle"""
+    x = np.arange(width)[None, :]
+    y = y[:, None]
+    u = x * math.cos(angle) - y * math.sin(angle)
+    v = x * math.sin(angle) + y * math.cos(angle)
+    return u, v
+
+
+def _directional_noise(seed, width, row_start, row_end, params):
+    u, _ = _strand_axes(np.arange(row_start, row_end), width, params["strand_angle"])
+    return _cell_random(seed, np.floor(u), 0)
+
+
+def _directional_shape(noise_vals, y, width, height, params):
+    _, v = _strand_axes(y, width, params["strand_angle"])
+    return _strand_fade(v, noise_vals, height, params)
+
+
+def _clumped_noise(seed, width, row_start, row_end, params):
+    # Nearest jittered cell point among the 3x3 neighbouring cells
+    cell = max(1.0, params["clump_size"] * width)
+    x = (np.arange(width) + 0.5) / cell
+    y = (np.arange(row_start, row_end) + 0.5) / cell
+    if not len(y):
+        return np.empty((0, width))
+    grid_x, grid_y = np.floor(x).astype(np.int64), np.floor(y).astype(np.int64)
+
+    # Hash each cell once on the small grid around the rows, then gather per pixel
+    cells_x = np.arange(grid_x[0] - 1, grid_x[-1] + 2)[None, :]
+    cells_y = np.arange(grid_y[0] - 1, grid_y[-1] + 2)[:, None]
+    jitter_x = _cell_random(seed, cells_x, cells_y, 1)
+    jitter_y = _cell_random(seed, cells_x, cells_y, 2)
+    cell_value = _cell_random(seed, cells_x, cells_y, 3)
+
+    # Squared distances to each neighbour's point, split into an x part that
+    # only depends on the cell row and a y part that only depends on the cell
+    # column; both are computed small and spread over the pixels
+    fx, fy = x - grid_x, y - grid_y
+    ix, iy = grid_x - grid_x[0] + 1, grid_y - grid_y[0] + 1
+    cell_rows, cell_cols = np.arange(iy[0], iy[-1] + 1), np.arange(ix[0], ix[-1] + 1)
+    # Pixels of one cell are contiguous, so spreading is a repeat
+    rows_per_cell, cols_per_cell = np.bincount(iy - iy[0]), np.bincount(ix - ix[0])
+    shape = (row_end - row_start, width)
+    nearest = np.full(shape, np.inf)
+    closer = np.empty(shape, dtype=bool)
+    best = np.zeros(shape, dtype=np.int8)
+    neighbours = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)]
+    for k, (dy, dx) in enumerate(neighbours):
+        # (cell rows, width) and (rows, cell columns)
+        cell_dist_x = ((fx - dx)[None, :] - jitter_x[cell_rows + dy][:, ix + dx]) ** 2
+        cell_dist_y = ((fy - dy)[:, None] - jitter_y[iy + dy][:, cell_cols + dx]) ** 2
+        dist = np.repeat(cell_dist_x, rows_per_cell, axis=0)
+        dist += np.repeat(cell_dist_y, cols_per_cell, axis=1)
+        np.less(dist, nearest, out=closer)
+        np.copyto(nearest, dist, where=closer)
+        np.putmask(best, closer, k)
+    nearest = np.sqrt(nearest)
+    # Flat index of each pixel's own cell plus that of its nearest neighbour
+    offsets = np.array([dy * cell_value.shape[1] + dx for dy, dx in neighbours])
+    cells = (iy * cell_value.shape[1])[:, None] + ix[None, :]
+    cells += offsets[best]
+    value = cell_value.ravel()[cells]
+
+    # Strands near a clump's center survive the most layers
+    return np.clip(0.5 * value + 0.5 * (1.0 - nearest), 0.0, 1.0)
+
+
+# Lengths are fractions of the texture size, so a pattern looks the same on
+# a 512 and a 4096 texture, and on downsampled layers. Strands are 10px on
+# 512px tall textures, like before they became configurable, but e.g. 40px
+# on 2048px ones.
+STRAND_LENGTH = PatternParam(
+    "strand_length", "Strand Length", "Length of each strand as a fraction of the texture height",
+    10 / 512, minimum=0.001, precision=4,
+)
+STRAND_FADE = PatternParam(
+    "strand_fade", "Strand Fade", "Share of each strand that fades out toward its tip",
+    0.4, subtype='FACTOR',
+)
+CLUMP_SIZE = PatternParam(
+    "clump_size", "Clump Size", "Size of the strand clumps as a fraction of the texture width",
+    0.05, minimum=0.001,
+)
+STRAND_ANGLE = PatternParam(
+    "strand_angle", "Strand Angle", "Slant of the strands away from vertical",
+    math.radians(30), minimum=-math.pi / 2, maximum=math.pi / 2, subtype='ANGLE',
+)
+
+register_pattern(
+    'RANDOM', "Random", "Random pixel deletion",
+    _random_noise, hair_noise=True,
+)
+register_pattern(
+    'VERTICAL', "Vertical", "Interspaced vertical lines semi-randomly",
+    _column_noise, _vertical_shape, params=(STRAND_LENGTH, STRAND_FADE),
+)
+register_pattern(
+    'CLUMPED', "Clumped", "Strands gathered in clumps (Voronoi cells) that thin out toward their edges",
+    _clumped_noise, params=(CLUMP_SIZE,),
+)
+register_pattern(
+    'DIRECTIONAL', "Directional", "Strands slanted by the strand angle",
+    _directional_noise, _directional_shape, params=(STRAND_LENGTH, STRAND_FADE, STRAND_ANGLE),
+)
+
+
+# ------------------------------------------------------------
+# Shell layer maps
+# ------------------------------------------------------------
+
+
+def prepare_shell_maps(rgba, noise_alpha=None, noise_vals=None, pattern='RANDOM', row_start=0,
+                       params=None, image_height=None):
+    """Precompute the layer-independent maps shared by every shell layer.
+
+    rgba is a (height, width, 4) float32 array, noise_alpha an optional 2D array
+    tiled over the image (hair noise patterns only) and noise_vals the
+    per-pixel deletion values. row_start is the image row of rgba's first row
+    and image_height the full image height when working on a tile. Returns
+    (rgb, alpha, noise_vals); a layer is then just a threshold of noise_vals,
+    see threshold_shell_layer.
+    """
+    kernel = PATTERNS[pattern]
+    height, width = rgba.shape[:2]
+    y = np.arange(row_start, row_start + height)
+
+    if noise_vals is None:
+        noise_vals = np.random.random((height, width))
+    else:
+        noise_vals = np.asarray(noise_vals, dtype=np.float64).reshape(height, width)
+
+    alpha = rgba[..., 3].copy()
+
+    # Multiply alpha by tiled noise, but only for hair noise patterns
+    if kernel.hair_noise and noise_alpha is not None and noise_alpha.size:
+        noise_height, noise_width = noise_alpha.shape
+        rows = y % noise_height
+        cols = np.arange(width) % noise_width
+        alpha *= noise_alpha[rows[:, None], cols[None, :]]
+
+    # Pattern shapes (e.g. strand fades) only depend on noise_vals, so they are shared too
+    if kernel.shape:
+        shape = kernel.shape(noise_vals, y, width, image_height or height, pattern_params(params))
+        alpha *= shape.astype(np.float32)
+
+    return rgba[..., :3], alpha, noise_vals
+
+
+def threshold_shell_layer(maps, deletion_ratio):
+    """Derive one shell layer from prepare_shell_maps output"""
+    rgb, alpha, noise_vals = maps
+
+    out = np.empty(alpha.shape + (4,), dtype=np.float32)
+    out[..., :3] = rgb
+    out[..., 3] = alpha
+
+    # Apply deletion and set color to 0 where alpha == 0
+    out[noise_vals < deletion_ratio, 3] = 0.0
+    out[out[..., 3] == 0.0, :3] = 0.0
+    return out
+
+
+def cutoff_shell_pixels(maps):
+    """Bake the deletion values of prepare_shell_maps output into alpha.
+
+    With MToon alpha_mode 'MASK', a layer with alpha_cutoff equal to its
+    deletion ratio then shows the same pixels as threshold_shell_layer, so a
+    single texture serves every layer. Partial alpha (e.g. vertical fade) is
+    reduced to the binary mask.
+    """
+    rgb, alpha, noise_vals = maps
+
+    out = np.zeros(alpha.shape + (4,), dtype=np.float32)
+    visible = alpha > 0.0
+    out[visible, :3] = rgb[visible]
+    out[visible, 3] = np.maximum(noise_vals[visible], CUTOFF_MIN)
+    return out
+
+
+def shell_layer_pixels(rgba, deletion_ratio=0.75, noise_alpha=None, noise_vals=None, pattern='RANDOM', params=None):
+    """Compute one shell layer from an RGBA array as whole-array operations"""
+    maps = prepare_shell_maps(rgba, noise_alpha=noise_alpha, noise_vals=noise_vals, pattern=pattern, params=params)
+    return threshold_shell_layer(maps, deletion_ratio)
+
+
+# ------------------------------------------------------------
+# Layer schedule
+# ------------------------------------------------------------
+
+def layer_deletion_ratios(layers, max_deletion=0.85):
+    """Share of pixels deleted per layer, from none at the innermost layer to max_deletion at the outermost"""
+    return [
+        max_deletion * (layer / (layers - 1.0) if layers > 1 else 0.0)
+        for layer in range(layers)
+    ]
+
+
+def lod_layer_indices(built, count):
+    """Evenly spaced subset of count layer indices out of built, keeping the innermost and outermost"""
+    if count <= 1:
+        return [0]
+    return [round(k * (built - 1) / (count - 1)) for k in range(count)]
+
+
+def layer_shrink(layer, width, height, halve_every=0, min_size=128):
+    """How many times layer's texture is halved, given a halve_every schedule.
+
+    Outer layers are mostly transparent, so layer k is halved k // halve_every
+    times, but never below min_size on the shorter side (or below its size
+    if that is smaller already). halve_every 0 disables downsampling.
+    """
+    if halve_every <= 0:
+        return 0
+    shrink = layer // halve_every
+    while shrink and min(width, height) >> shrink < min_size:
+        shrink -= 1
+    return shrink
+
+
+def shrunk_size(width, height, shrink):
+    """Texture size after halving shrink times, rounding up"""
+    factor = 1 << shrink
+    return -(-width // factor), -(-height // factor)
+
+
+# ------------------------------------------------------------
+# Layer atlas
+# ------------------------------------------------------------
+
+def atlas_grid(layers):
+    """Columns and rows of the near-square grid an atlas of layers tiles uses"""
+    cols = math.ceil(math.sqrt(layers))
+    return cols, math.ceil(layers / cols)
+
+
+def atlas_cell_size(width, height):
+    """Size of one atlas cell: a width x height tile plus its gutter on every side.
+
+    The gutter is 1/ATLAS_GUTTER of the tile, rounded up, so the UV inset
+    is the same fraction of a cell for every texture size. Sizes that are
+    not a multiple of ATLAS_GUTTER land within a texel of that inset.
+    """
+    return width + 2 * -(-width // ATLAS_GUTTER), height + 2 * -(-height // ATLAS_GUTTER)
+
+
+def atlas_shrink(width, height, layers, max_size=4096):
+    """How many times tiles are halved so the atlas of layers fits max_size"""
+    cols, rows = atlas_grid(layers)
+    shrink = 0
+    while True:
+        tile_width, tile_height = shrunk_size(width, height, shrink)
+        cell_width, cell_height = atlas_cell_size(tile_width, tile_height)
+        if (cell_width * cols <= max_size and cell_height * rows <= max_size) or tile_width == tile_height == 1:
+            return shrink
+        shrink += 1
+
+
+def pack_atlas(tiles, cols, rows):
+    """Place equally sized (h, w, 4) tiles in a grid of atlas_cell_size cells.
+
+    tiles may be a generator, only the current tile is held besides the
+    atlas. See place_atlas_tile for the layout.
+    """
+    atlas = None
+    for k, tile in enumerate(tiles):
+        atlas = place_atlas_tile(atlas, k, tile, cols, rows)
+    return atlas
+
+
+def place_atlas_tile(atlas, k, tile, cols, rows):
+    """Copy tile k into atlas, creating the atlas for the first tile; returns the atlas.
+
+    Tile k goes to column k % cols and row k // cols, counting rows from the
+    bottom like UV coordinates. Each tile's edge pixels are repeated into its
+    gutter, so filtering and mip levels don't bleed neighbouring layers in.
+    Unused cells stay transparent.
+    """
+    height, width = tile.shape[:2]
+    cell_width, cell_height = atlas_cell_size(width, height)
+    pad_x, pad_y = (cell_width - width) // 2, (cell_height - height) // 2
+    if atlas is None:
+        atlas = np.zeros((rows * cell_height, cols * cell_width, 4), dtype=tile.dtype)
+    row, col = divmod(k, cols)
+    atlas[row * cell_height:(row + 1) * cell_height, col * cell_width:(col + 1) * cell_width] = np.pad(
+        tile, ((pad_y, pad_y), (pad_x, pad_x), (0, 0)), mode='edge'
+    )
+    return atlas
+
+
+
+# ------------------------------------------------------------
+# Downsampling
+# ------------------------------------------------------------
+
+def _box_reduce(array, factor):
+    """Average factor x factor blocks over the first two axes.
+
+    Partial blocks at the top and right edges repeat the last row or column,
+    so a tile of whole blocks reduces exactly like the full image.
+    """
+    height, width = array.shape[:2]
+    pad = [(0, -height % factor), (0, -width % factor)] + [(0, 0)] * (array.ndim - 2)
+    if pad[0][1] or pad[1][1]:
+        array = np.pad(array, pad, mode='edge')
+    blocks = array.reshape((array.shape[0] // factor, factor, array.shape[1] // factor, factor) + array.shape[2:])
+    return blocks.mean(axis=(1, 3), dtype=np.float64).astype(np.float32)
+
+
+def downsample_rgba(rgba, shrink):
+    """Area-average rgba down by 2**shrink with premultiplied alpha.
+
+    Transparent pixels don't bleed their (often black) color into edges;
+    blocks that are fully transparent keep their plain average color.
+    """
+    if shrink <= 0:
+        return rgba
+    factor = 1 << shrink
+    alpha = rgba[..., 3:4]
+    reduced = _box_reduce(np.concatenate([rgba[..., :3] * alpha, alpha], axis=-1), factor)
+    reduced_alpha = reduced[..., 3:4]
+    rgb = np.where(
+        reduced_alpha > 0,
+        reduced[..., :3] / np.maximum(reduced_alpha, 1e-8),
+        _box_reduce(rgba[..., :3], factor),
+    )
+    return np.concatenate([rgb, reduced_alpha], axis=-1).astype(np.float32)
+
+
+def downsample_alpha(alpha, shrink):
+    """Area-average a single channel map down by 2**shrink"""
+    if shrink <= 0 or alpha is None:
+        return alpha
+    return _box_reduce(alpha, 1 << shrink)
+
+
+# ------------------------------------------------------------
+# Shell texture cache (content-addressed, on disk)
+# ------------------------------------------------------------
+
+# Bump when the generated pixels change for the same inputs
+CACHE_VERSION = 3
+
+
+def pixel_digest(array):
+    """Hash of an array's contents, used for content-addressed keys"""
+    array = np.ascontiguousarray(array)
+    digest = hashlib.sha1(str((array.dtype.str, array.shape)).encode())
+    digest.update(array.data)
+    return digest.hexdigest()
+
+
+def shell_source_digest(rgba, noise_alpha, noise_vals, pattern, params=None):
+    """Digest of everything a shell layer depends on except its deletion ratio"""
+    parts = [
+        str(CACHE_VERSION),
+        pattern,
+        repr(sorted(pattern_key_params(pattern, params).items())),
+        pixel_digest(rgba),
+        pixel_digest(noise_alpha) if noise_alpha is not None else "",
+        pixel_digest(noise_vals),
+    ]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def shell_cache_key(source_digest, deletion_ratio):
+    """Key of one shell layer: its source digest plus the layer's deletion ratio"""
+    return hashlib.sha1(f"{source_digest}|{deletion_ratio!r}".encode()).hexdigest()
+
+
+def shell_fingerprint(**params):
+    """Short stable hash of generation parameters, stored on generated data"""
+    return hashlib.sha1(repr(sorted(params.items())).encode()).hexdigest()[:16]
+
+
+def to_uint8(pixels):
+    """Quantize float pixels with the rounding Blender uses for byte images"""
+    return np.clip(np.floor(pixels * 255.0 + 0.5), 0, 255).astype(np.uint8)
+
+
+class ShellTextureCache:
+    """Size-bounded LRU cache of generated shell pixels stored as .npy files.
+
+    Entries are stored as 8-bit RGBA, which is what Blender keeps for the
+    generated byte images anyway. Recency is tracked with file mtimes so it
+    persists across sessions.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            data = np.load(path)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return data.astype(np.float32) / 255.0
+
+    def put(self, key, pixels):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.save(f, to_uint8(pixels))
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".npy"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    # Removed by another process evicting at the same time
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+# ------------------------------------------------------------
+# Layer generation (usable as a process pool worker)
+# ------------------------------------------------------------
+
+def generate_shell_layers(rgba, deletion_ratios, noise_alpha=None, noise_vals=None, pattern='RANDOM', cache=None,
+                          params=None, memo=None):
+    """Generate shell layer pixels for each deletion ratio from one decode.
+
+    If deletion_ratios is None a single shared alpha-cutoff layer is produced
+    instead (see cutoff_shell_pixels). Layers found in cache are loaded
+    instead of computed. Yields (height, width, 4) float32 arrays one at a
+    time; store each before taking the next so only one layer is alive.
+    memo is an optional dict that keeps the cache digest and layer maps
+    between calls with the same inputs.
+    """
+    cutoff = deletion_ratios is None
+    ratios = ["cutoff"] if cutoff else list(deletion_ratios)
+    memo = {} if memo is None else memo
+
+    # Random noise_vals are never reproduced, so only cache explicit ones
+    keys = [None] * len(ratios)
+    if noise_vals is not None:
+        noise_vals = np.asarray(noise_vals, dtype=np.float64).reshape(rgba.shape[:2])
+        if cache is not None:
+            if "source" not in memo:
+                memo["source"] = shell_source_digest(rgba, noise_alpha, noise_vals, pattern, params)
+            keys = [shell_cache_key(memo["source"], ratio) for ratio in ratios]
+
+    for ratio, key in zip(ratios, keys):
+        pixels = cache.get(key) if key else None
+        if pixels is None:
+            if "maps" not in memo:
+                memo["maps"] = prepare_shell_maps(
+                    rgba, noise_alpha=noise_alpha, noise_vals=noise_vals, pattern=pattern, params=params
+                )
+            maps = memo["maps"]
+            pixels = cutoff_shell_pixels(maps) if cutoff else threshold_shell_layer(maps, ratio)
+            if key:
+                cache.put(key, pixels)
+        yield pixels
+
+
+def shell_texture_set(rgba, seed, layers, pattern='RANDOM', noise_alpha=None, cutoff=False,
+                      halve_every=0, min_size=128, max_deletion=0.85, cache=None, params=None):
+    """Generate all shell textures of one base texture the way the add-on does.
+
+    seed is the scene noise seed; the per-texture seed is derived from it and
+    the pixels. Yields (layer, pixels) pairs, grouped by resolution (see
+    layer_shrink); with cutoff a single shared texture is yielded as layer 0.
+    params override the PATTERN_PARAMS defaults.
+    """
+    height, width = rgba.shape[:2]
+    texture_seed = derive_seed(seed, base_image_digest(width, height, 4, [rgba]))
+
+    if cutoff:
+        noise_vals = noise_map(texture_seed, width, height, pattern, params)
+        yield 0, next(generate_shell_layers(rgba, None, noise_alpha, noise_vals, pattern, cache, params))
+        return
+
+    ratios = layer_deletion_ratios(layers, max_deletion)
+    shrinks = [layer_shrink(layer, width, height, halve_every, min_size) for layer in range(layers)]
+    for shrink in sorted(set(shrinks)):
+        group = [layer for layer in range(layers) if shrinks[layer] == shrink]
+        pixels = generate_shell_layers(
+            downsample_rgba(rgba, shrink),
+            [ratios[layer] for layer in group],
+            noise_alpha=downsample_alpha(noise_alpha, shrink),
+            noise_vals=noise_map(texture_seed, width, height, pattern, params, shrink),
+            pattern=pattern,
+            cache=cache,
+            params=params,
+        )
+        yield from zip(group, pixels)
+
+
+# Full size base pixels and hair noise of the build a pool worker serves,
+# plus the prepared inputs of the job it ran last (see shell_layers_worker)
+_worker_state = {"bases": {}, "noise_alpha": None, "job": None}
+
+
+def init_shell_worker(bases, noise_alpha=None):
+    """Process pool initializer: bases maps a key to full size RGBA, sent once per worker"""
+    _worker_state["bases"] = bases
+    _worker_state["noise_alpha"] = noise_alpha
+    _worker_state["job"] = None
+
+
+def shell_layers_worker(base_key, deletion_ratios, noise_seed, shrink=0, pattern='RANDOM', cache=None, params=None):
+    """Process pool entry point: generate_shell_layers returning 8-bit arrays.
+
+    Works on a base sent by init_shell_worker, halved shrink times, with
+    noise regenerated from noise_seed (see noise_map). The inputs and layer
+    maps of the last job are kept, so a worker prepares each job once however
+    many of its tasks it runs. Shell images are stored as bytes by Blender
+    anyway, so converting in the worker is lossless and cuts the data sent
+    back to the main process by 4x.
+    """
+    key = (base_key, shrink, noise_seed, pattern, sorted(pattern_params(params).items()))
+    job = _worker_state["job"]
+    if job is None or job[0] != key:
+        # Let the previous job's arrays go before allocating the new ones
+        _worker_state["job"] = None
+        base = _worker_state["bases"][base_key]
+        job = (
+            key,
+            downsample_rgba(base, shrink),
+            downsample_alpha(_worker_state["noise_alpha"], shrink),
+            noise_map(noise_seed, base.shape[1], base.shape[0], pattern, params, shrink),
+            {},
+        )
+        _worker_state["job"] = job
+
+    _, rgba, noise_alpha, noise_vals, memo = job
+    return [
+        to_uint8(pixels)
+        for pixels in generate_shell_layers(rgba, deletion_ratios, noise_alpha, noise_vals, pattern, cache, params, memo)
+    ]
+
+
+# ------------------------------------------------------------
+# Instrumentation
+# ------------------------------------------------------------
+
+class StageTimer:
+    """Accumulate wall-clock seconds per named build stage"""
+
+    def __init__(self):
+        self.stages = {}
+        self._start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def as_dict(self):
+        return {
+            "total": time.perf_counter() - self._start,
+            "stages": dict(self.stages),
+        }
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tests only use the bpy-free parts of the add-on package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
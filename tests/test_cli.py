@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pytest
+
+from shelltexture_vrm import cli
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def write_texture(path, seed=0):
+    pixels = np.random.Generator(np.random.PCG64(seed)).integers(0, 256, (24, 32, 4), dtype=np.uint8)
+    Image.fromarray(pixels, "RGBA").save(path)
+
+
+def test_cli_writes_one_png_per_layer(tmp_path):
+    write_texture(tmp_path / "hair.png")
+
+    assert cli.main([str(tmp_path), str(tmp_path / "out"), "--layers", "3", "--workers", "1"]) == 0
+    assert sorted(os.listdir(tmp_path / "out")) == ["hair_shell_0.png", "hair_shell_1.png", "hair_shell_2.png"]
+    with Image.open(tmp_path / "out" / "hair_shell_2.png") as img:
+        assert img.size == (32, 24) and img.mode == "RGBA"
+
+
+def test_cli_keeps_inputs_with_the_same_name_apart(tmp_path):
+    write_texture(tmp_path / "hair.png", 0)
+    write_texture(tmp_path / "hair.tga", 1)
+
+    assert cli.main([str(tmp_path), str(tmp_path / "out"), "--cutoff", "--workers", "1"]) == 0
+    assert sorted(os.listdir(tmp_path / "out")) == ["hair_png_shell.png", "hair_tga_shell.png"]
+
+
+def test_cli_rejects_zero_layers(tmp_path):
+    with pytest.raises(SystemExit) as exit_info:
+        cli.parse_args([str(tmp_path), str(tmp_path / "out"), "--layers", "0"])
+    assert exit_info.value.code == 2
+
+
+def test_cli_rejects_a_missing_input_dir(tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main([str(tmp_path / "missing"), str(tmp_path / "out")])
+    assert exit_info.value.code == 2
+    assert "is not a directory" in capsys.readouterr().err
+
+
+def test_cli_rejects_writing_next_to_the_inputs(tmp_path):
+    write_texture(tmp_path / "hair.png")
+
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main([str(tmp_path), str(tmp_path / "." / ""), "--workers", "1"])
+    assert exit_info.value.code == 2
+    assert os.listdir(tmp_path) == ["hair.png"]
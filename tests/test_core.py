@@ -0,0 +1,427 @@
+import os
+
+import numpy as np
+import pytest
+
+from shelltexture_vrm import core
+from shelltexture_vrm.core import (
+    ATLAS_GUTTER,
+    ShellTextureCache,
+    PATTERN_PARAMS,
+    PATTERNS,
+    PatternParam,
+    atlas_cell_size,
+    atlas_grid,
+    atlas_shrink,
+    cutoff_shell_pixels,
+    downsample_alpha,
+    downsample_rgba,
+    generate_shell_layers,
+    hair_noise_alpha,
+    init_shell_worker,
+    layer_deletion_ratios,
+    layer_shrink,
+    noise_map,
+    noise_rows,
+    pack_atlas,
+    pattern_key_params,
+    pattern_params,
+    prepare_shell_maps,
+    register_pattern,
+    shell_layer_pixels,
+    shell_layers_worker,
+    shell_texture_set,
+    shrunk_size,
+    threshold_shell_layer,
+    to_uint8,
+)
+
+
+def baseline_shell_pixels(rgba, deletion_ratio, noise_alpha, noise_vals, pattern, strand_height=10, fade_length=4):
+    """The original per-pixel create_shell_texture loop, on arrays instead of images"""
+    height, width = rgba.shape[:2]
+    out = np.zeros((height, width, 4), dtype=np.float32)
+    for y in range(height):
+        for x in range(width):
+            r, g, b, alpha = (float(c) for c in rgba[y, x])
+
+            if pattern == 'RANDOM' and noise_alpha is not None:
+                alpha *= float(noise_alpha[y % noise_alpha.shape[0], x % noise_alpha.shape[1]])
+
+            rand_val = float(noise_vals[y, x])
+            if rand_val < deletion_ratio:
+                alpha = 0.0
+
+            if pattern == 'VERTICAL' and alpha > 0:
+                offset = int(rand_val * strand_height)
+                y_mod = (y + offset) % strand_height
+                fade_start = strand_height - fade_length
+                if y_mod >= fade_start:
+                    alpha *= 1.0 - (y_mod - fade_start) / fade_length
+
+            if alpha == 0.0:
+                r = g = b = 0.0
+            out[y, x] = (r, g, b, alpha)
+    return out
+
+
+def base_texture(width, height, seed=0):
+    rng = np.random.Generator(np.random.PCG64(seed))
+    rgba = rng.random((height, width, 4), dtype=np.float32)
+    # Some fully transparent pixels, as in real hair textures
+    rgba[..., 3] = np.where(rgba[..., 3] < 0.2, 0.0, rgba[..., 3])
+    return rgba
+
+
+@pytest.mark.parametrize("deletion_ratio", [0.0, 0.3, 0.85])
+def test_random_matches_baseline_loop(deletion_ratio):
+    rgba = base_texture(40, 24)
+    noise_alpha = np.random.Generator(np.random.PCG64(1)).random((16, 16), dtype=np.float32)
+    noise_vals = noise_map(7, 40, 24, 'RANDOM')
+
+    expected = baseline_shell_pixels(rgba, deletion_ratio, noise_alpha, noise_vals, 'RANDOM')
+    actual = shell_layer_pixels(rgba, deletion_ratio, noise_alpha, noise_vals, 'RANDOM')
+    np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+
+@pytest.mark.parametrize("deletion_ratio", [0.0, 0.5])
+def test_vertical_matches_baseline_loop_on_512_tall_textures(deletion_ratio):
+    # The default strand length is 10/512 of the height: the baseline's 10px at 512
+    rgba = base_texture(16, 512)
+    noise_vals = noise_map(3, 16, 512, 'VERTICAL')
+
+    expected = baseline_shell_pixels(rgba, deletion_ratio, None, noise_vals, 'VERTICAL')
+    actual = shell_layer_pixels(rgba, deletion_ratio, None, noise_vals, 'VERTICAL')
+    np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+
+def test_vertical_matches_baseline_loop_with_pixel_strand_length():
+    # Other heights reproduce the baseline when the strand length is set to 10px
+    rgba = base_texture(12, 96)
+    noise_vals = noise_map(3, 12, 96, 'VERTICAL')
+
+    expected = baseline_shell_pixels(rgba, 0.25, None, noise_vals, 'VERTICAL')
+    actual = shell_layer_pixels(rgba, 0.25, None, noise_vals, 'VERTICAL', params={"strand_length": 10 / 96})
+    np.testing.assert_allclose(actual, expected, atol=1e-6)
+
+
+def test_vertical_default_strands_scale_with_texture_height():
+    # Pinned on purpose: strands are 10/512 of the height, so 20px (fading
+    # over 8px) on a 1024px tall texture instead of the baseline's fixed 10px
+    rgba = base_texture(8, 1024)
+    noise_vals = noise_map(3, 8, 1024, 'VERTICAL')
+
+    actual = shell_layer_pixels(rgba, 0.25, None, noise_vals, 'VERTICAL')
+    scaled = baseline_shell_pixels(rgba, 0.25, None, noise_vals, 'VERTICAL', strand_height=20, fade_length=8)
+    np.testing.assert_allclose(actual, scaled, atol=1e-6)
+    assert not np.allclose(actual, baseline_shell_pixels(rgba, 0.25, None, noise_vals, 'VERTICAL'), atol=1e-6)
+
+
+@pytest.mark.parametrize("pattern", list(PATTERNS))
+def test_float32_settings_give_the_same_layers(pattern):
+    # Blender float properties hold float32, the command line tool float64
+    cli_params = {name: param.default for name, param in PATTERN_PARAMS.items()}
+    blender_params = {name: float(np.float32(value)) for name, value in cli_params.items()}
+    assert pattern_key_params(pattern, cli_params) == pattern_key_params(pattern, blender_params)
+
+    rgba = base_texture(64, 64)
+    layers = [
+        shell_layer_pixels(rgba, 0.5, None, noise_map(4, 64, 64, pattern, params), pattern, params)
+        for params in (cli_params, blender_params)
+    ]
+    np.testing.assert_array_equal(*layers)
+
+
+def test_registered_pattern_params_have_defaults(monkeypatch):
+    monkeypatch.setattr(core, "PATTERNS", dict(PATTERNS))
+    monkeypatch.setattr(core, "PATTERN_PARAMS", dict(PATTERN_PARAMS))
+
+    def stripes(seed, width, row_start, row_end, params):
+        return np.broadcast_to((np.arange(width) * params["stripe_width"]) % 1.0, (row_end - row_start, width))
+
+    register_pattern('STRIPES', "Stripes", "Test pattern", stripes,
+                     params=(PatternParam("stripe_width", "Stripe Width", "Test parameter", 0.25),))
+
+    assert pattern_key_params('STRIPES') == {"stripe_width": 0.25}
+    assert pattern_params({"stripe_width": 0.5})["stripe_width"] == 0.5
+    assert noise_map(0, 4, 2, 'STRIPES').tolist() == [[0.0, 0.25, 0.5, 0.75]] * 2
+    with pytest.raises(ValueError):
+        register_pattern('OTHER', "Other", "Clashing parameter", stripes,
+                         params=(PatternParam("stripe_width", "Stripe Width", "Test parameter", 0.5),))
+
+
+@pytest.mark.parametrize("clump_size", [0.001, 0.013, 0.05, 0.5])
+def test_clumped_noise_matches_per_pixel_cell_search(clump_size):
+    width, height = 47, 35
+    cell = max(1.0, float(np.float32(clump_size)) * width)
+    x = (np.arange(width)[None, :] + 0.5) / cell
+    y = (np.arange(height)[:, None] + 0.5) / cell
+
+    # Every pixel hashes its 3x3 neighbouring cells itself
+    nearest = np.full((height, width), np.inf)
+    value = np.zeros_like(nearest)
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            cx, cy = np.floor(x) + dx, np.floor(y) + dy
+            dist = np.hypot(x - (cx + core._cell_random(9, cx, cy, 1)), y - (cy + core._cell_random(9, cx, cy, 2)))
+            value = np.where(dist < nearest, core._cell_random(9, cx, cy, 3), value)
+            nearest = np.minimum(dist, nearest)
+    expected = np.clip(0.5 * value + 0.5 * (1.0 - nearest), 0.0, 1.0)
+
+    actual = noise_map(9, width, height, 'CLUMPED', {"clump_size": clump_size})
+    np.testing.assert_allclose(actual, expected, rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("pattern", list(PATTERNS))
+def test_noise_rows_match_full_map_for_any_split(pattern):
+    width, height = 37, 53
+    full = noise_map(11, width, height, pattern)
+    for splits in ([0, height], [0, 1, height], [0, 17, 18, 40, height], list(range(height + 1))):
+        parts = [noise_rows(11, width, start, end, pattern) for start, end in zip(splits, splits[1:])]
+        np.testing.assert_array_equal(np.concatenate(parts), full)
+
+
+@pytest.mark.parametrize("pattern", list(PATTERNS))
+def test_shrunk_noise_samples_the_full_size_map(pattern):
+    width, height = 37, 53
+    full = noise_map(11, width, height, pattern)
+    for shrink in (1, 2):
+        factor = 1 << shrink
+        shrunk = noise_map(11, width, height, pattern, shrink=shrink)
+        np.testing.assert_array_equal(shrunk, full[::factor, ::factor])
+        parts = [noise_rows(11, width, start, end, pattern, shrink=shrink) for start, end in ((0, 3), (3, 4), (4, len(shrunk)))]
+        np.testing.assert_array_equal(np.concatenate(parts), shrunk)
+
+
+@pytest.mark.parametrize("pattern", list(PATTERNS))
+def test_tiled_maps_match_whole_image(pattern):
+    width, height = 24, 64
+    rgba = base_texture(width, height)
+    noise_alpha = hair_noise_alpha(0, 16)
+    noise_vals = noise_map(5, width, height, pattern)
+    whole = prepare_shell_maps(rgba, noise_alpha, noise_vals, pattern)
+
+    for start, end in ((0, 20), (20, 21), (21, height)):
+        tile = prepare_shell_maps(
+            rgba[start:end], noise_alpha, noise_rows(5, width, start, end, pattern), pattern,
+            row_start=start, image_height=height,
+        )
+        for whole_map, tile_map in zip(whole, tile):
+            np.testing.assert_array_equal(tile_map, whole_map[start:end])
+
+
+@pytest.mark.parametrize("pattern", list(PATTERNS))
+def test_cutoff_selects_the_same_pixels_as_threshold(pattern):
+    rgba = base_texture(32, 32)
+    maps = prepare_shell_maps(rgba, hair_noise_alpha(0, 16), noise_map(9, 32, 32, pattern), pattern)
+    cutoff = cutoff_shell_pixels(maps)
+
+    for ratio in layer_deletion_ratios(8):
+        layer = threshold_shell_layer(maps, ratio)
+        # MToon MASK shows pixels with alpha >= alpha_cutoff, see enable_mtoon_material
+        shown = cutoff[..., 3] >= max(ratio, 1.0 / 255.0)
+        np.testing.assert_array_equal(shown, layer[..., 3] > 0)
+        np.testing.assert_array_equal(cutoff[shown, :3], layer[shown, :3])
+
+
+def test_generate_shell_layers_yields_one_layer_per_ratio():
+    rgba = base_texture(16, 16)
+    noise_vals = noise_map(2, 16, 16)
+    ratios = layer_deletion_ratios(4)
+
+    layers = generate_shell_layers(rgba, ratios, None, noise_vals)
+    assert not isinstance(layers, list)
+    for ratio, layer in zip(ratios, layers):
+        np.testing.assert_array_equal(layer, shell_layer_pixels(rgba, ratio, None, noise_vals))
+
+
+def test_worker_regenerates_noise_from_the_seed():
+    rgba = base_texture(24, 16)
+    ratios = layer_deletion_ratios(4)
+    init_shell_worker({"hair": rgba})
+
+    for shrink in (0, 1):
+        expected = generate_shell_layers(
+            downsample_rgba(rgba, shrink), ratios, None, noise_map(6, 24, 16, 'CLUMPED', shrink=shrink), 'CLUMPED',
+        )
+        # Tasks of one job share the worker's prepared maps
+        layers = shell_layers_worker("hair", ratios[:2], 6, shrink, 'CLUMPED')
+        assert core._worker_state["job"][4]["maps"] is not None
+        layers += shell_layers_worker("hair", ratios[2:], 6, shrink, 'CLUMPED')
+        for layer, pixels in zip(layers, expected):
+            np.testing.assert_array_equal(layer, to_uint8(pixels))
+    init_shell_worker({})
+
+
+def test_pack_atlas_pads_tiles_with_their_edge_pixels():
+    layers = 5
+    cols, rows = atlas_grid(layers)
+    tiles = [base_texture(64, 32, seed) for seed in range(layers)]
+    atlas = pack_atlas(iter(tiles), cols, rows)
+
+    cell_width, cell_height = atlas_cell_size(64, 32)
+    pad_x, pad_y = (cell_width - 64) // 2, (cell_height - 32) // 2
+    assert (pad_x, pad_y) == (64 // ATLAS_GUTTER, 32 // ATLAS_GUTTER)
+    assert atlas.shape == (rows * cell_height, cols * cell_width, 4)
+
+    for k, tile in enumerate(tiles):
+        row, col = divmod(k, cols)
+        cell = atlas[row * cell_height:(row + 1) * cell_height, col * cell_width:(col + 1) * cell_width]
+        np.testing.assert_array_equal(cell[pad_y:-pad_y, pad_x:-pad_x], tile)
+        np.testing.assert_array_equal(cell[:pad_y + 1, pad_x:-pad_x], np.broadcast_to(tile[:1], (pad_y + 1, 64, 4)))
+        np.testing.assert_array_equal(cell[pad_y:-pad_y, -pad_x - 1:], np.broadcast_to(tile[:, -1:], (32, pad_x + 1, 4)))
+
+    # The node graph maps uv 0..1 onto the tile, inside the gutter (see _atlas_uv)
+    for uv in (0.0, 1.0):
+        cell_uv = (1.0 + uv * ATLAS_GUTTER) / (ATLAS_GUTTER + 2)
+        assert cell_uv * cell_width == pad_x + uv * 64
+    # Unused cells stay transparent
+    assert not atlas[rows * cell_height - cell_height:, (layers % cols) * cell_width:].any()
+
+
+def test_atlas_shrink_fits_the_padded_cells():
+    cols, rows = atlas_grid(16)
+    shrink = atlas_shrink(1024, 1024, 16, 4096)
+    assert shrink == 1
+    cell_width, cell_height = atlas_cell_size(512, 512)
+    assert cell_width * cols <= 4096 and cell_height * rows <= 4096
+
+
+def test_layer_shrink_follows_the_schedule_down_to_min_size():
+    assert [layer_shrink(layer, 1024, 1024, 0) for layer in range(8)] == [0] * 8
+    assert [layer_shrink(layer, 1024, 1024, 2) for layer in range(8)] == [0, 0, 1, 1, 2, 2, 3, 3]
+    # The shorter side never drops below min_size
+    assert [layer_shrink(layer, 1024, 256, 1, 64) for layer in range(5)] == [0, 1, 2, 2, 2]
+    # Textures already smaller than min_size are never halved
+    assert layer_shrink(10, 100, 100, 1, 128) == 0
+
+
+def test_shrunk_size_rounds_up():
+    assert shrunk_size(1024, 512, 0) == (1024, 512)
+    assert shrunk_size(1024, 512, 2) == (256, 128)
+    assert shrunk_size(1000, 7, 2) == (250, 2)
+    assert shrunk_size(1, 1, 3) == (1, 1)
+
+
+@pytest.mark.parametrize("shrink", [1, 2, 3])
+def test_downsampled_tiles_match_the_whole_image(shrink):
+    # Odd sizes leave partial blocks at the top and right edges
+    factor = 1 << shrink
+    rgba = base_texture(37, 61)
+    whole = downsample_rgba(rgba, shrink)
+    assert whole.shape[:2] == shrunk_size(37, 61, shrink)[::-1]
+
+    tile_rows = 2 * factor
+    tiles = [downsample_rgba(rgba[start:start + tile_rows], shrink) for start in range(0, 61, tile_rows)]
+    np.testing.assert_array_equal(np.concatenate(tiles), whole)
+
+    alpha = rgba[..., 3]
+    tiles = [downsample_alpha(alpha[start:start + tile_rows], shrink) for start in range(0, 61, tile_rows)]
+    np.testing.assert_array_equal(np.concatenate(tiles), downsample_alpha(alpha, shrink))
+
+
+def test_downsample_rgba_averages_with_premultiplied_alpha():
+    rgba = np.zeros((2, 2, 4), dtype=np.float32)
+    rgba[0, 0] = (1.0, 0.5, 0.0, 1.0)
+    rgba[0, 1] = (0.0, 0.5, 1.0, 0.5)
+    # Transparent black must not darken the result
+    out = downsample_rgba(rgba, 1)
+    np.testing.assert_allclose(out[0, 0], ((1.0 + 0.0 * 0.5) / 1.5, 0.5, 0.5 / 1.5, 0.375), rtol=1e-6)
+
+    # Fully transparent blocks keep their plain average color
+    rgba[..., 3] = 0.0
+    np.testing.assert_allclose(downsample_rgba(rgba, 1)[0, 0], (0.25, 0.25, 0.25, 0.0), rtol=1e-6)
+    assert downsample_rgba(rgba, 0) is rgba
+
+
+def test_shell_texture_set_groups_layers_by_resolution():
+    rgba = base_texture(64, 64)
+    layers = list(shell_texture_set(rgba, 0, 6, halve_every=2, min_size=16))
+
+    assert [layer for layer, _ in layers] == [0, 1, 2, 3, 4, 5]
+    assert [pixels.shape[:2] for _, pixels in layers] == [(64, 64)] * 2 + [(32, 32)] * 2 + [(16, 16)] * 2
+
+    # Full size layers are unaffected, and layers of one size share their
+    # noise, so each deletes a superset of the one before
+    full = dict(shell_texture_set(rgba, 0, 6))
+    for layer in (0, 1):
+        np.testing.assert_array_equal(layers[layer][1], full[layer])
+    assert not np.any((layers[3][1][..., 3] > 0) & (layers[2][1][..., 3] == 0))
+
+    cutoff = list(shell_texture_set(rgba, 0, 6, cutoff=True, halve_every=2))
+    assert len(cutoff) == 1 and cutoff[0][0] == 0 and cutoff[0][1].shape[:2] == (64, 64)
+
+
+def test_cache_round_trips_8_bit_pixels(tmp_path):
+    cache = ShellTextureCache(str(tmp_path), 1 << 20)
+    pixels = base_texture(8, 4)
+
+    assert cache.get("missing") is None
+    cache.put("layer", pixels)
+    loaded = cache.get("layer")
+    assert loaded.dtype == np.float32 and loaded.shape == pixels.shape
+    # Stored as 8-bit, like Blender's byte images
+    np.testing.assert_array_equal(to_uint8(loaded), to_uint8(pixels))
+    np.testing.assert_allclose(loaded, pixels, atol=0.5 / 255.0 + 1e-6)
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    pixels = base_texture(16, 16)
+    entry_bytes = 16 * 16 * 4 + 128  # 8-bit pixels plus the .npy header
+    cache = ShellTextureCache(str(tmp_path), 2 * entry_bytes)
+
+    cache.put("a", pixels)
+    cache.put("b", pixels)
+    os.utime(tmp_path / "a.npy", (1, 1))
+    os.utime(tmp_path / "b.npy", (2, 2))
+    # Reading a makes it the most recently used entry
+    assert cache.get("a") is not None
+    cache.put("c", pixels)
+
+    assert sorted(os.listdir(tmp_path)) == ["a.npy", "c.npy"]
+
+
+def test_cache_treats_corrupted_entries_as_missing(tmp_path):
+    cache = ShellTextureCache(str(tmp_path), 1 << 20)
+    (tmp_path / "broken.npy").write_bytes(b"not an array")
+    assert cache.get("broken") is None
+
+    cache.put("broken", base_texture(4, 4))
+    assert cache.get("broken") is not None
+
+
+def test_cache_eviction_skips_entries_removed_meanwhile(tmp_path, monkeypatch):
+    cache = ShellTextureCache(str(tmp_path), 1 << 20)
+    cache.put("a", base_texture(4, 4))
+    cache.put("b", base_texture(4, 4))
+    cache.max_bytes = 0
+
+    real_scandir = os.scandir
+
+    def scandir_losing_entries(path):
+        # Another worker removes every entry after it was listed
+        entries = list(real_scandir(path))
+        for entry in entries:
+            os.remove(entry.path)
+        return iter(entries)
+
+    monkeypatch.setattr(core.os, "scandir", scandir_losing_entries)
+    assert len(os.listdir(tmp_path)) == 2
+    cache.evict()
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize("pattern", list(PATTERNS))
+def test_downsampled_layers_stay_nested_in_full_size_layers(pattern):
+    rgba = base_texture(64, 64)
+    rgba[..., 3] = 1.0
+    layers = dict(shell_texture_set(rgba, 0, 8, pattern=pattern, halve_every=2, min_size=8))
+
+    for inner, outer in ((1, 2), (1, 4), (3, 6), (5, 7)):
+        factor = layers[inner].shape[0] // layers[outer].shape[0]
+        assert factor > 1
+        # Each outer pixel is drawn from the first pixel of its block in the inner layer
+        inner_visible = layers[inner][::factor, ::factor, 3] > 0
+        outer_visible = layers[outer][..., 3] > 0
+        assert outer_visible.any()
+        assert not np.any(outer_visible & ~inner_visible)